@@ -48,6 +48,10 @@ INVALID_TIMESTAMP = Error("IllegalArgumentException", "Invalid timestamp.", 400)
 INVALID_CREDENTIALS = Error("ForbiddenOperationException", "Invalid credentials. Invalid username or password.", 403)
 INVALID_CREDENTIALS_RATE_LIMIT = Error("TooManyRequestsException", "Invalid credentials. "
                                                                    "Invalid username or password.", 429)
+PASSWORD_POOL_BUSY = Error("ServiceUnavailableException", "The server is too busy to check credentials right now. "
+                                                         "Try again later.", 503)
+TEXTURE_POOL_BUSY = Error("ServiceUnavailableException", "The server is too busy to process textures right now. "
+                                                         "Try again later.", 503)
 INVALID_IMAGE = Error("IllegalArgumentException", "Provided image is illegal or invalid.", 400)
 
 OVER_PROFILE_LIMIT = Error("IllegalArgumentException", "Not more than 10 profile name per call is allowed.", 400)
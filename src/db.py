@@ -1,16 +1,33 @@
+from atexit import register as register_exit
+from calendar import timegm
 from datetime import datetime, timedelta
+from threading import Lock
 from uuid import UUID, uuid4
 
 from jwt import decode as jwt_decode, exceptions as jwt_exceptions
-from pony.orm import set_sql_debug, Database, PrimaryKey, Required, Set, Optional, desc
+from pony.orm import set_sql_debug, Database, PrimaryKey, Required, Set, Optional, desc, flush, composite_index, \
+    exists, select, db_session
 
 from util.exceptions import InvalidAuthHeaderException, AuthorizationException, ExistsException
+from util.texture_storage import store_texture, delete_texture
+from util.textures_property import invalidate_textures
 from constant.security_questions import SECURITY_QUESTIONS
-from paths import DB_PATH, SKINS_ROOT, CAPES_ROOT
+from migrations import migrate, create_triggers
+from paths import DB_PATH
 
 set_sql_debug(False)
 db = Database()
 
+NAME_LOOKUP_CHUNK_SIZE = 500  # SQLite limits the amount of parameters in a single query
+
+_unreferenced_textures = set()  # (kind, name) whose last row may have been deleted
+_unreferenced_textures_lock = Lock()
+
+
+def normalize_name(name: str) -> str:
+    """Get the case-insensitive lookup key of a profile name."""
+    return name.casefold()
+
 
 class Account(db.Entity):
     id = PrimaryKey(int, auto=True)
@@ -99,6 +116,36 @@ class Account(db.Entity):
                 address=address
             )
 
+    def invalidate_access_tokens(self, keep=None):
+        """Mark every AccessToken of this account as invalid for authenticating with game servers.
+
+        Runs a single UPDATE over the client_token index instead of loading the tokens.
+        AccessTokens already loaded in this db_session are not refreshed.
+
+        :param AccessToken keep: AccessToken to leave untouched
+        """
+        flush()
+        account_id = self.id
+        keep_id = keep.id if keep is not None else None
+        db.execute("""
+            UPDATE "AccessToken" SET "authentication_valid" = 0
+            WHERE "client_token" IN (SELECT "id" FROM "ClientToken" WHERE "account" = $account_id)
+            AND ($keep_id IS NULL OR "id" != $keep_id)
+        """)
+
+    def delete_access_tokens(self):
+        """Delete every AccessToken of this account.
+
+        Runs a single DELETE over the client_token index instead of loading the tokens.
+        AccessTokens already loaded in this db_session must not be used afterwards.
+        """
+        flush()
+        account_id = self.id
+        db.execute("""
+            DELETE FROM "AccessToken"
+            WHERE "client_token" IN (SELECT "id" FROM "ClientToken" WHERE "account" = $account_id)
+        """)
+
     def __repr__(self):
         return f"{self.id}, {self.username}, {self.uuid}"
 
@@ -142,6 +189,7 @@ class Profile(db.Entity):
     name = Required(str, unique=True)
     name_upper = Required(str, unique=True)
     name_lower = Required(str, unique=True)
+    name_key = Required(str, unique=True)  # normalize_name(name), used for all case-insensitive lookups
 
     profile_skin = Optional('ProfileSkin', cascade_delete=True)
     profile_cape = Optional('ProfileCape', cascade_delete=True)
@@ -157,26 +205,20 @@ class Profile(db.Entity):
         if self.profile_skin is not None:
             self.profile_skin.delete()
 
-    def update_skin(self, image, model):
+    def update_skin(self, name, data, model):
         """Create or update skin and corresponding file.
 
-        :param PIL.Image.Image image: 64x32 or 64x64 PNG Image
+        :param str name: Content address of the skin
+        :param bytes data: Encoded 64x32 or 64x64 skin
         :param str model: "" for Classic, "slim" for Slim
-        :raise ValueError: If image isn't PNG or the right size.
         :return: Newly created ProfileSkin
         :rtype: ProfileSkin
         """
-        if image.format != "PNG":
-            raise ValueError(f"Image must be in PNG format. It is {image.format}")
-
-        width, height = image.size
-        if width != 64 or height not in [32, 64]:
-            raise ValueError(f"Image size must be either (64, 32) or (64, 64). It is {image.size}")
-
         self.reset_skin()
 
-        profile_skin = ProfileSkin(profile=self, model=model)
-        image.save(SKINS_ROOT.joinpath(profile_skin.name), format="PNG")
+        profile_skin = ProfileSkin(profile=self, model=model, name=name)
+        flush()  # Hold the database write lock while storing, see delete_unreferenced_textures().
+        store_texture("skin", profile_skin.name, data)
         return profile_skin
 
     def reset_cape(self):
@@ -188,34 +230,34 @@ class Profile(db.Entity):
         if self.profile_cape is not None:
             self.profile_cape.delete()
 
-    def update_cape(self, image):
+    def update_cape(self, name, data):
         """Create or update cape and corresponding file.
 
-        :param PIL.Image.Image image: 64x32 PNG Image
-        :raise ValueError: If image isn't PNG or 64x32
+        :param str name: Content address of the cape
+        :param bytes data: Encoded 64x32 cape
         :return: Newly created ProfileCape
         :rtype: ProfileCape
         """
-        if image.format != "PNG":
-            raise ValueError(f"Image must be in PNG format. It is {image.format}")
-
-        width, height = image.size
-        if width != 64 or height != 32:
-            raise ValueError(f"Image size must be (64, 32). It is {image.size}")
-
         self.reset_cape()
 
-        profile_cape = ProfileCape(profile=self)
-        image.save(CAPES_ROOT.joinpath(profile_cape.name), format="PNG")
+        profile_cape = ProfileCape(profile=self, name=name)
+        flush()  # Hold the database write lock while storing, see delete_unreferenced_textures().
+        store_texture("cape", profile_cape.name, data)
         return profile_cape
 
-    def get_texture_data(self, textures_host) -> dict:
+    def get_texture_data(self, textures_host, skin_and_cape=None) -> dict:
         """Get texture data
 
         The keys used will be in the format the clients are expecting.
 
+        :param textures_host: Host serving the textures
+        :param tuple skin_and_cape: (ProfileSkin or None, ProfileCape or None) if already loaded, else None
         :return: B64 encoding ready dict
         """
+        if skin_and_cape is None:
+            skin_and_cape = (self.profile_skin, self.profile_cape)
+        profile_skin, profile_cape = skin_and_cape
+
         data = {
             "timestamp": int(datetime.utcnow().timestamp()*1000),
             "profileId": self.uuid.hex,
@@ -225,16 +267,16 @@ class Profile(db.Entity):
 
             }
         }
-        if self.profile_skin is not None:
+        if profile_skin is not None:
             data["textures"]["SKIN"] = {
-                "url": f"http://{textures_host}/texture/{self.profile_skin.name}"
+                "url": f"http://{textures_host}/texture/{profile_skin.name}"
             }
-            if self.profile_skin.model == "slim":
+            if profile_skin.model == "slim":
                 # WHO CAME UP WITH THIS FORMAT? WHAT IS THIS???
                 data["textures"]["SKIN"]["metadata"] = {"model": "slim"}
-        if self.profile_cape is not None:
+        if profile_cape is not None:
             data["textures"]["CAPE"] = {
-                "url": f"http://{textures_host}/texture/{self.profile_cape.name}"
+                "url": f"http://{textures_host}/texture/{profile_cape.name}"
             }
 
         return data
@@ -251,6 +293,7 @@ class Profile(db.Entity):
         self.name = new_name
         self.name_upper = new_name.upper()
         self.name_lower = new_name.lower()
+        self.name_key = normalize_name(new_name)
 
     def change_name(self, new_name_attempt):
         """Try to change profile's name.
@@ -296,22 +339,18 @@ class Profile(db.Entity):
         :return: ProfileNameEvent that defined the owner of the name at given time
         :rtype: ProfileNameEvent or None
         """
-        event = ProfileNameEvent.select(lambda x: (x.name == name
-                                        or x.name_upper == name.upper()
-                                        or x.name_lower == name.lower())
-                                        and x.active_from < datetime_object)\
+        name_key = normalize_name(name)
+        # A later event of the same profile before datetime_object means the profile changed away from the name.
+        # The name can't have been taken by another profile in between, so the most recent event is the only
+        # candidate and this finds the same event as looking it up first and checking for later events.
+        return select(x for x in ProfileNameEvent
+                      if x.name_key == name_key and x.active_from < datetime_object
+                      and not exists(y for y in ProfileNameEvent
+                                     if y.profile == x.profile
+                                     and y.active_from > x.active_from
+                                     and y.active_from < datetime_object))\
             .order_by(desc(ProfileNameEvent.active_from)).first()
 
-        if event is None:
-            return None
-
-        if ProfileNameEvent.select(lambda x: x.profile == event.profile
-                                   and x.active_from > event.active_from
-                                   and x.active_from < datetime_object).exists():
-            return None
-
-        return event
-
     def initial_name_event(self):
         """Get initial NameEvent for this profile.
 
@@ -441,17 +480,54 @@ class Profile(db.Entity):
         :param name: Case-insensitive name
         :rtype: Profile or None
         """
-        return Profile.get(lambda x: x.name == name
-                           or x.name_upper == name.upper()
-                           or x.name_lower == name.lower())
+        return Profile.get(name_key=normalize_name(name))
+
+    @staticmethod
+    def get_profiles_with_names(names) -> dict:
+        """Get profiles with case-insensitive names in as few queries as possible
+
+        :param names: Iterable of case-insensitive names
+        :return: {normalize_name(name): Profile} for the names which belong to a profile
+        """
+        name_keys = list({normalize_name(name) for name in names})
+        profiles = {}
+        for start in range(0, len(name_keys), NAME_LOOKUP_CHUNK_SIZE):
+            chunk = name_keys[start:start + NAME_LOOKUP_CHUNK_SIZE]
+            for profile in Profile.select(lambda x: x.name_key in chunk):
+                profiles[profile.name_key] = profile
+        return profiles
+
+    @staticmethod
+    def get_profiles_with_uuids(uuids) -> dict:
+        """Get profiles with UUIDs and their skins and capes in as few queries as possible
+
+        Pony does not remember that a profile has no skin or cape, reading profile_skin or profile_cape
+        would query once per profile. Pass the returned skin and cape on to Profile.get_texture_data() instead.
+
+        :param uuids: Iterable of UUID objects
+        :return: {UUID: (Profile, ProfileSkin or None, ProfileCape or None)} for the UUIDs which belong to a profile
+        """
+        uuids = list(set(uuids))
+        profiles = {}
+        for start in range(0, len(uuids), NAME_LOOKUP_CHUNK_SIZE):
+            chunk = uuids[start:start + NAME_LOOKUP_CHUNK_SIZE]
+            for profile, profile_skin, profile_cape in \
+                    select((x, x.profile_skin, x.profile_cape) for x in Profile if x.uuid in chunk):
+                profiles[profile.uuid] = (profile, profile_skin, profile_cape)
+        return profiles
 
     def __init__(self, *args, **kwargs):
         if "name_upper" not in kwargs:
             kwargs["name_upper"] = kwargs["name"].upper()
         if "name_lower" not in kwargs:
             kwargs["name_lower"] = kwargs["name"].lower()
+        if "name_key" not in kwargs:
+            kwargs["name_key"] = normalize_name(kwargs["name"])
         super().__init__(*args, **kwargs)
 
+    def after_update(self):
+        invalidate_textures(self.id)
+
     def __repr__(self):
         return f"{self.id}, {self.name}, {self.uuid} (for {self.agent}) -of> {self.account.id}, {self.account.username}"
 
@@ -544,39 +620,49 @@ class AccessToken(db.Entity):
             "sub": self.client_token.account.uuid.hex,
             "yggt": self.uuid.hex,
             "issr": self.issuer,
-            "exp": int(self.expiry_utc.timestamp()),
-            "iat": int(self.created_utc.timestamp())
+            "exp": timegm(self.expiry_utc.utctimetuple()),
+            "iat": timegm(self.created_utc.utctimetuple()),
+            "ctk": self.client_token.uuid.hex,
         }
         if self.profile:
             data["spr"] = self.profile.uuid.hex
         return data
 
     @staticmethod
-    def from_token(token):
-        """Get AccessToken from token string
+    def uuid_from_token(token):
+        """Get AccessToken UUID from token string without looking it up
 
         :param UUID or str token: JWT encoded token or token UUID string, either dashed or not, or UUID object
-        :rtype: AccessToken or None
+        :rtype: UUID or None
         """
         if isinstance(token, str):
             try:
-                uuid_object = UUID(token)
+                return UUID(token)
             except ValueError:  # token is invalid UUID, may be JWT
                 try:
                     jwt_decoded = jwt_decode(jwt=token, verify=False)
-                    uuid_object = UUID(jwt_decoded["yggt"])
-                except (jwt_exceptions.DecodeError, jwt_exceptions.InvalidAlgorithmError, ValueError):
+                    return UUID(jwt_decoded["yggt"])
+                except (jwt_exceptions.DecodeError, jwt_exceptions.InvalidAlgorithmError, ValueError, KeyError,
+                        TypeError):
                     return None
-                else:
-                    return AccessToken.get(uuid=uuid_object)
-            else:  # token is valid UUID
-                return AccessToken.get(uuid=uuid_object)
 
         elif isinstance(token, UUID):
-            return AccessToken.get(uuid=token)
+            return token
 
         return None
 
+    @staticmethod
+    def from_token(token):
+        """Get AccessToken from token string
+
+        :param UUID or str token: JWT encoded token or token UUID string, either dashed or not, or UUID object
+        :rtype: AccessToken or None
+        """
+        uuid_object = AccessToken.uuid_from_token(token)
+        if uuid_object is None:
+            return None
+        return AccessToken.get(uuid=uuid_object)
+
     def __repr__(self):
         return f"{self.id}, {self.uuid}, {'valid' if self.authentication_valid else 'invalid'}, " \
                f"{self.created_utc} to {self.expiry_utc}, by {self.issuer}, {self.client_token.id}, " \
@@ -596,13 +682,33 @@ class ProfileNameEvent(db.Entity):
     name = Required(str)
     name_upper = Required(str)
     name_lower = Required(str)
+    name_key = Required(str)  # normalize_name(name)
+
+    composite_index(name_key, active_from)
+    composite_index(profile, active_from)
 
     @property
     def is_initial_name(self) -> bool:
-        """Determine if this is the first name of a profile."""
+        """Determine if this is the first name of a profile.
+
+        Runs a query every time. Use ProfileNameEvent.history() when going through all events of a profile.
+        """
         return not ProfileNameEvent.select(lambda x: x.profile == self.profile and x.active_from < self.active_from)\
             .exists()
 
+    @staticmethod
+    def history(profile_uuid: UUID) -> list:
+        """Get every ProfileNameEvent of a profile in a single query.
+
+        The first event is the initial name of the profile.
+        Returns an empty list if there is no profile with this UUID.
+
+        :param profile_uuid: UUID of the profile
+        :return: ProfileNameEvents, oldest first
+        """
+        return list(ProfileNameEvent.select(lambda x: x.profile.uuid == profile_uuid)
+                    .order_by(ProfileNameEvent.active_from, ProfileNameEvent.id))
+
     @staticmethod
     def last_event(name):
         """Return the most recent event with this name.
@@ -611,9 +717,8 @@ class ProfileNameEvent(db.Entity):
         :rtype: ProfileNameEvent
         :return: Active ProfileNameEvent with this name
         """
-        return ProfileNameEvent.select(lambda x: x.name == name
-                                       or x.name_upper == name.upper()
-                                       or x.name_lower == name.lower())\
+        name_key = normalize_name(name)
+        return ProfileNameEvent.select(lambda x: x.name_key == name_key)\
             .order_by(desc(ProfileNameEvent.active_from)).first()
 
     def __init__(self, *args, **kwargs):
@@ -621,43 +726,99 @@ class ProfileNameEvent(db.Entity):
             kwargs["name_upper"] = kwargs["name"].upper()
         if "name_lower" not in kwargs:
             kwargs["name_lower"] = kwargs["name"].lower()
+        if "name_key" not in kwargs:
+            kwargs["name_key"] = normalize_name(kwargs["name"])
         super().__init__(*args, **kwargs)
 
+    def describe(self, is_initial=None, timestamp=False) -> str:
+        """Describe the event like __repr__() does.
+
+        :param bool or None is_initial: Whether this is the initial name, looked up if None
+        :param bool timestamp: Use integer timestamps instead of human readable time
+        """
+        if is_initial is None:
+            is_initial = self.is_initial_name
+        return f"Profile ({self.profile.id}, {self.profile.name}), " \
+               f"{'created with' if is_initial else 'changed name'} " \
+               f"@ {self.active_from.timestamp() if timestamp else self.active_from}: {self.name}"
+
     def repr_timestamp(self):
         """Use integer timestamps instead of human readable time like in __repr__()"""
-        return f"Profile ({self.profile.id}, {self.profile.name}), " \
-               f"{'created with' if self.is_initial_name else 'changed name'} " \
-               f"@ {self.active_from.timestamp()}: {self.name}"
+        return self.describe(timestamp=True)
 
     def __repr__(self):
-        return f"Profile ({self.profile.id}, {self.profile.name}), " \
-               f"{'created with' if self.is_initial_name else 'changed name'} " \
-               f"@ {self.active_from}: {self.name}"
+        return self.describe()
 
     def __str__(self):
         return repr(self)
 
 
+class ProfileChange(db.Entity):
+    """Written by the triggers in migrations.TRIGGERS whenever a profile, its name or UUID, or its history changes.
+
+    Ids only grow, so a process can catch up by reading the rows after the last id it saw.
+    """
+    id = PrimaryKey(int, auto=True)
+    profile_id = Required(int)  # Not a reference, the profile may be deleted
+
+
 class ProfileSkin(db.Entity):
     id = PrimaryKey(int, auto=True)
     profile = Required(Profile)
 
-    name = Required(str, unique=True, default=lambda: "".join([uuid4().hex, uuid4().hex]))
+    name = Required(str, index=True)  # texture_hash(), shared by every ProfileSkin of the same texture
     model = Optional(str)  # "" or None if Steve, "slim" if Alex.
 
+    def after_insert(self):
+        invalidate_textures(self.profile.id)
+
     def before_delete(self):
-        SKINS_ROOT.joinpath(self.name).unlink()
+        invalidate_textures(self.profile.id)
+        with _unreferenced_textures_lock:
+            _unreferenced_textures.add(("skin", self.name))
 
 
 class ProfileCape(db.Entity):
     id = PrimaryKey(int, auto=True)
     profile = Required(Profile)
 
-    name = Required(str, unique=True, default=lambda: "".join([uuid4().hex, uuid4().hex]))
+    name = Required(str, index=True)  # texture_hash(), shared by every ProfileCape of the same texture
+
+    def after_insert(self):
+        invalidate_textures(self.profile.id)
 
     def before_delete(self):
-        CAPES_ROOT.joinpath(self.name).unlink()
+        invalidate_textures(self.profile.id)
+        with _unreferenced_textures_lock:
+            _unreferenced_textures.add(("cape", self.name))
+
+
+def delete_unreferenced_textures():
+    """Delete the textures of deleted skins and capes which no other row uses.
+
+    Call after the deleting transaction, outside db_session. It runs as late as process exit otherwise.
+    The check and the deletion happen in a transaction holding the database write lock.
+    Profile.update_skin() and update_cape() store a texture while holding that lock too,
+    so an upload of the same texture either committed before the check and keeps the texture,
+    or stores it again after it was deleted.
+    """
+    with _unreferenced_textures_lock:
+        candidates = set(_unreferenced_textures)
+        _unreferenced_textures.clear()
+    if not candidates:
+        return
+
+    with db_session(immediate=True):
+        for kind, name in candidates:
+            entity = ProfileSkin if kind == "skin" else ProfileCape
+            if not entity.exists(name=name):  # A rolled back deletion left its row, and keeps the texture.
+                delete_texture(kind, name)
+
+
+register_exit(delete_unreferenced_textures)
 
 
+migrate(DB_PATH)
 db.bind(provider="sqlite", filename=str(DB_PATH), create_db=True)
 db.generate_mapping(create_tables=True)
+create_triggers(DB_PATH)
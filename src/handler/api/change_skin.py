@@ -1,37 +1,57 @@
 from io import BytesIO
 from uuid import UUID
 
-from PIL import Image, UnidentifiedImageError
 from flask import Request
 from pony.orm import db_session
-from requests import get
 
-from util.exceptions import InvalidAuthHeaderException
+from util.exceptions import InvalidAuthHeaderException, TextureFetchException, InvalidImageException, \
+    PoolBusyException
 from constant.error import INVALID_SKIN, INVALID_UUID, INVALID_TOKEN, AUTH_HEADER_MISSING, MISSING_SKIN, NULL_MESSAGE, \
-    INVALID_IMAGE, UNTRUSTED_IP
-from db import AccessToken, Profile
+    INVALID_IMAGE, UNTRUSTED_IP, TEXTURE_POOL_BUSY
+from db import Profile, delete_unreferenced_textures
+from util.png_header import SKIN_SIZES, check_png_stream
+from util.texture_fetch import fetch_texture
+from util.texture_pool import prepare_texture
+from util.token_cache import lookup_header
 
 
 def set_skin(readable, model, profile: Profile):
     try:
-        image: Image = Image.open(readable)
-    except (FileNotFoundError, UnidentifiedImageError, ValueError):
+        check_png_stream(readable, SKIN_SIZES)
+    except InvalidImageException:
         # May be inconsistent with official API
         return INVALID_IMAGE.dual
+    except ValueError:
+        # May be inconsistent with official API
+        return INVALID_SKIN.dual
 
     try:
-        profile.update_skin(image, model)
+        name, data = prepare_texture(readable.read(), SKIN_SIZES)
+    except InvalidImageException:
+        # May be inconsistent with official API
+        return INVALID_IMAGE.dual
     except ValueError:
         # May be inconsistent with official API
         return INVALID_SKIN.dual
+    except PoolBusyException:
+        # May be inconsistent with official API
+        return TEXTURE_POOL_BUSY.dual
+
+    profile.update_skin(name, data, model)
 
     return "", 204
 
 
-@db_session
 def json_and_response_code(request: Request, uuid):
+    response = _change_skin(request, uuid)
+    delete_unreferenced_textures()  # The replaced or reset skin is only deleted once the transaction committed.
+    return response
+
+
+@db_session
+def _change_skin(request: Request, uuid):
     try:
-        token = AccessToken.from_header(request.headers.get("Authorization"))
+        token = lookup_header(request.headers.get("Authorization"))
     except InvalidAuthHeaderException:
         return AUTH_HEADER_MISSING.dual
     if token is None:
@@ -45,7 +65,7 @@ def json_and_response_code(request: Request, uuid):
         return INVALID_UUID.dual
 
     profile: Profile = Profile.get(uuid=uuid_object)
-    if profile is None or profile.account != token.client_token.account:
+    if profile is None or profile.account.id != token.account_id:
         # May be inconsistent with official API
         return INVALID_TOKEN.dual
 
@@ -57,8 +77,15 @@ def json_and_response_code(request: Request, uuid):
             # May be inconsistent with official API
             return MISSING_SKIN.dual
 
-        response = get(request.form["url"])
-        return set_skin(BytesIO(response.content), request.form["model"], profile)
+        try:
+            data = fetch_texture(request.form["url"], SKIN_SIZES)
+        except (TextureFetchException, InvalidImageException):
+            # May be inconsistent with official API
+            return INVALID_IMAGE.dual
+        except ValueError:
+            # May be inconsistent with official API
+            return INVALID_SKIN.dual
+        return set_skin(BytesIO(data), request.form["model"], profile)
 
     elif request.method == "PUT":
         if "file" not in request.files or "model" not in request.form:
@@ -1,9 +1,9 @@
 from uuid import UUID
 
 from flask import jsonify
-from pony.orm import db_session, desc
+from pony.orm import db_session
 
-from db import Profile, ProfileNameEvent
+from db import ProfileNameEvent
 
 
 @db_session
@@ -16,16 +16,16 @@ def json_and_response_code(uuid):
     except ValueError:
         return "", 204
 
-    profile = Profile.get(uuid=uuid_object)
+    events = ProfileNameEvent.history(uuid_object)
 
-    if profile is None:
+    if len(events) == 0:  # Every profile has an initial event, so there is no such profile.
         return "", 204
 
     history = []
 
-    for event in profile.profile_name_events.order_by(desc(ProfileNameEvent.active_from)):
+    for index, event in reversed(list(enumerate(events))):
         event: ProfileNameEvent
-        if event.is_initial_name:
+        if index == 0:
             history.append({
                 "name": event.name
             })
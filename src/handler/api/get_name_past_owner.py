@@ -4,7 +4,8 @@ from flask import jsonify
 from pony.orm import db_session
 
 from constant.error import INVALID_TIMESTAMP
-from db import Profile
+from db import Profile, normalize_name
+from util.name_timeline import name_timeline
 
 
 @db_session
@@ -17,6 +18,17 @@ def json_and_response_code(request, username):
         except (ValueError, OSError):
             return INVALID_TIMESTAMP.dual
 
+    if name_timeline.is_current():
+        owner = name_timeline.owner_at(normalize_name(username), at)
+        if owner is None:
+            return "", 204
+
+        uuid_hex, name = owner
+        return jsonify({
+            "id": uuid_hex,
+            "name": name
+        }), 200
+
     event = Profile.that_owned_name_at(username, at)
     if event is None:
         return "", 204
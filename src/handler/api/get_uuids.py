@@ -1,21 +1,32 @@
 from flask import jsonify
 from pony.orm import db_session
 
-from constant.error import OVER_PROFILE_LIMIT
-from db import Profile
+from constant.error import Error, OVER_PROFILE_LIMIT, BAD_REQUEST
+from db import Profile, normalize_name
 from util.decorators import require_json
 
+DEFAULT_LIMIT = 10
+
 
 @db_session
 @require_json
-def json_and_response_code(request):
-    if len(request.json) > 10:
-        return OVER_PROFILE_LIMIT.dual
+def json_and_response_code(request, limit=DEFAULT_LIMIT):
+    if not isinstance(request.json, list):
+        return BAD_REQUEST.dual
+
+    if len(request.json) > limit:
+        if limit == DEFAULT_LIMIT:
+            return OVER_PROFILE_LIMIT.dual
+        return Error(OVER_PROFILE_LIMIT.error, f"Not more than {limit} profile name per call is allowed.",
+                     OVER_PROFILE_LIMIT.status).dual
+
+    names = [name for name in request.json if isinstance(name, str)]
+    profiles = Profile.get_profiles_with_names(names)
 
     uuids = []
 
-    for name in request.json:
-        profile = Profile.get_profile_with_name(name)
+    for name in names:
+        profile = profiles.get(normalize_name(name))
         if profile is None:
             continue
 
@@ -5,19 +5,23 @@ from util.decorators import require_json
 from util.exceptions import InvalidAuthHeaderException, AuthorizationException
 from constant.error import AUTH_HEADER_MISSING, INVALID_TOKEN, UNTRUSTED_IP, INCORRECT_ANSWERS
 from constant.security_questions import SECURITY_QUESTIONS
-from db import AccessToken
+from db import Account
+from util.token_cache import lookup_header
 
 
 @db_session
 def list_challenges(request):
     try:
-        token = AccessToken.from_header(request.headers.get("Authorization"))
+        token = lookup_header(request.headers.get("Authorization"))
     except InvalidAuthHeaderException:
         return AUTH_HEADER_MISSING.dual
     if token is None:
         return INVALID_TOKEN.dual
 
-    account = token.client_token.account
+    account = Account.get(id=token.account_id)
+    if account is None:
+        return INVALID_TOKEN.dual
+
     return_questions = []
     for question in account.security_questions:
         return_questions.append({
@@ -36,13 +40,15 @@ def list_challenges(request):
 @require_json
 def location(request):
     try:
-        token = AccessToken.from_header(request.headers.get("Authorization"))
+        token = lookup_header(request.headers.get("Authorization"))
     except InvalidAuthHeaderException:
         return AUTH_HEADER_MISSING.dual
     if token is None:
         return INVALID_TOKEN.dual
 
-    account = token.client_token.account
+    account = Account.get(id=token.account_id)
+    if account is None:
+        return INVALID_TOKEN.dual
 
     if request.method == "GET":
         if account.does_trust_ip(request.remote_addr):
@@ -1,14 +1,15 @@
 from uuid import UUID
 
 from flask import jsonify
-
-from jwt import encode as jwt_encode
 from pony.orm import db_session
 
-from constant.error import INVALID_CREDENTIALS, INVALID_TOKEN, NULL_MESSAGE
+from constant.error import INVALID_CREDENTIALS, INVALID_TOKEN, NULL_MESSAGE, PASSWORD_POOL_BUSY
 from db import ClientToken, Profile, AccessToken
+from util.access_token import encode_access_token, revocations
 from util.auth import attempt_login
 from util.decorators import require_json
+from util.token_cache import commit_and_evict_account
+from util.exceptions import PoolBusyException
 
 
 @db_session
@@ -17,7 +18,10 @@ def json_and_response_code(request):
     if "username" not in request.json or "password" not in request.json:
         return NULL_MESSAGE.dual
 
-    account = attempt_login(request.json["username"], request.json["password"])
+    try:
+        account = attempt_login(request.json["username"], request.json["password"])
+    except PoolBusyException:
+        return PASSWORD_POOL_BUSY.dual
     if account is None:
         return INVALID_CREDENTIALS.dual
 
@@ -56,7 +60,7 @@ def json_and_response_code(request):
     )
 
     response_data = {
-        "accessToken": jwt_encode(access_token.format(), key="").decode(),
+        "accessToken": encode_access_token(access_token),
         "clientToken": client_token_string
     }
 
@@ -77,8 +81,8 @@ def json_and_response_code(request):
         if len(available_profiles) == 1:
             response_data["selectedProfile"] = response_data["availableProfiles"][0]
 
-    for token in AccessToken \
-            .select(lambda candidate: candidate.client_token.account == account and candidate != access_token):
-        token.authentication_valid = False
+    account.invalidate_access_tokens(keep=access_token)
+    revocations.revoke_account(account.uuid.hex, keep=access_token.uuid.hex)
+    commit_and_evict_account(account.id)
 
     return jsonify(response_data), 200
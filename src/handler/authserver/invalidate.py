@@ -4,8 +4,10 @@ from jwt import exceptions as jwt_exceptions
 from pony.orm import db_session
 
 from db import AccessToken
+from util.access_token import revocations
 from util.auth import read_yggt
 from util.decorators import require_json
+from util.token_cache import commit_and_evict_tokens
 
 
 @db_session
@@ -23,6 +25,12 @@ def json_and_response_code(request):
     except (jwt_exceptions.DecodeError, ValueError):
         return "", 204
 
+    revoked_uuids = []
+    for access_token in access_tokens:
+        revocations.revoke_token(access_token)
+        revoked_uuids.append(access_token.uuid)
     access_tokens.delete()
 
+    commit_and_evict_tokens(revoked_uuids)
+
     return "", 204
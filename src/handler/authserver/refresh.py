@@ -1,13 +1,13 @@
 from uuid import UUID
 
 from flask import jsonify
-
-from jwt import encode as jwt_encode
 from pony.orm import db_session
 
 from constant.error import INVALID_TOKEN, NULL_CLIENT_TOKEN, NULL_ACCESS_TOKEN, INVALID_UUID, PROFILE_NOT_FOUND
 from db import AccessToken, Profile
+from util.access_token import encode_access_token, revocations
 from util.decorators import require_json
+from util.token_cache import commit_and_evict_tokens
 
 
 @db_session
@@ -45,10 +45,14 @@ def json_and_response_code(request):
         profile=new_profile,
     )
 
+    revocations.revoke_token(access_token)
+    old_uuid = access_token.uuid
     access_token.delete()
 
+    commit_and_evict_tokens([old_uuid])
+
     response_data = {
-        "accessToken": jwt_encode(new_access_token.format(), key="").decode(),
+        "accessToken": encode_access_token(new_access_token),
         "clientToken": request.json["clientToken"],
     }
 
@@ -1,9 +1,11 @@
 from pony.orm import db_session
 
-from constant.error import INVALID_CREDENTIALS, INVALID_CREDENTIALS_RATE_LIMIT
-from db import AccessToken
+from constant.error import INVALID_CREDENTIALS, INVALID_CREDENTIALS_RATE_LIMIT, PASSWORD_POOL_BUSY
+from util.access_token import revocations
 from util.auth import attempt_login
 from util.decorators import require_json
+from util.exceptions import PoolBusyException
+from util.token_cache import commit_and_evict_account
 
 
 @db_session
@@ -12,10 +14,15 @@ def json_and_response_code(request):
     if "username" not in request.json or "password" not in request.json:
         return INVALID_CREDENTIALS_RATE_LIMIT.dual
 
-    account = attempt_login(request.json["username"], request.json["password"])
+    try:
+        account = attempt_login(request.json["username"], request.json["password"])
+    except PoolBusyException:
+        return PASSWORD_POOL_BUSY.dual
     if account is None:
         return INVALID_CREDENTIALS.dual
 
-    AccessToken.select(lambda tkn: tkn.client_token.account == account).delete()
+    account.delete_access_tokens()
+    revocations.revoke_account(account.uuid.hex)
+    commit_and_evict_account(account.id)
 
     return "", 204
@@ -3,8 +3,10 @@ from uuid import UUID
 from pony.orm import db_session
 
 from constant.error import NULL_ACCESS_TOKEN, INVALID_TOKEN
-from db import AccessToken, ClientToken
+from util.access_token import verify_access_token
 from util.decorators import require_json
+from util.exceptions import InvalidTokenException
+from util.token_cache import lookup_token
 
 
 @db_session
@@ -13,18 +15,34 @@ def json_and_response_code(request):
     if "accessToken" not in request.json:
         return NULL_ACCESS_TOKEN.dual
 
-    access_token = AccessToken.from_token(request.json["accessToken"])
+    try:
+        claims = verify_access_token(request.json["accessToken"])
+    except InvalidTokenException:
+        return INVALID_TOKEN.dual
+
+    if claims is not None:  # Signed by us and not revoked, no need to look it up.
+        if "clientToken" in request.json:
+            try:
+                request_client_token_uuid = UUID(request.json["clientToken"])
+            except ValueError:
+                return INVALID_TOKEN.dual
+
+            if claims.get("ctk") != request_client_token_uuid.hex:
+                return INVALID_TOKEN.dual
+
+        return "", 204
+
+    access_token = lookup_token(request.json["accessToken"])
     if access_token is None:
         return INVALID_TOKEN.dual
 
     if "clientToken" in request.json:
         try:
             request_client_token_uuid = UUID(request.json["clientToken"])
-            client_token = ClientToken.get(lambda t: t.uuid == request_client_token_uuid)
         except ValueError:
-            client_token = None
+            return INVALID_TOKEN.dual
 
-        if client_token is None or client_token != access_token.client_token:
+        if request_client_token_uuid != access_token.client_token_uuid:
             return INVALID_TOKEN.dual
 
     if not access_token.authentication_valid:
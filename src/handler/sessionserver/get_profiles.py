@@ -0,0 +1,47 @@
+from uuid import UUID
+
+from flask import jsonify
+from pony.orm import db_session
+
+from constant.error import Error, OVER_PROFILE_LIMIT, BAD_REQUEST
+from db import Profile
+from util.decorators import require_json
+from util.public_profile_details import get_public_profile_details
+
+DEFAULT_LIMIT = 500
+
+
+@db_session
+@require_json
+def json_and_response_code(request, textures_host, limit=DEFAULT_LIMIT):
+    if not isinstance(request.json, list):
+        return BAD_REQUEST.dual
+
+    if len(request.json) > limit:
+        return Error(OVER_PROFILE_LIMIT.error, f"Not more than {limit} profile per call is allowed.",
+                     OVER_PROFILE_LIMIT.status).dual
+
+    uuid_objects = []
+    for uuid in request.json:
+        if not isinstance(uuid, str):
+            continue
+        try:
+            uuid_objects.append(UUID(uuid))
+        except ValueError:
+            continue
+
+    profiles = Profile.get_profiles_with_uuids(uuid_objects)
+
+    unsigned = request.args.get("unsigned")
+    unsigned = unsigned is None or unsigned != "false"
+
+    details = []
+    for uuid_object in dict.fromkeys(uuid_objects):
+        entry = profiles.get(uuid_object)
+        if entry is None:
+            continue
+
+        profile, profile_skin, profile_cape = entry
+        details.append(get_public_profile_details(profile, unsigned, textures_host, (profile_skin, profile_cape)))
+
+    return jsonify(details), 200
@@ -1,13 +1,18 @@
 from uuid import UUID
 
 from flask import Request, jsonify
-from pony.orm import db_session
+from pony.orm import db_session, commit
 
 from constant.error import NULL_ACCESS_TOKEN, NULL_MESSAGE, INVALID_UUID, INVALID_TOKEN, MCSERVER_DIFFERENT_IP, \
     MCSERVER_INVALID_SESSION, MCSERVER_INVALID_PROFILE
-from db import AccessToken, Profile, MCServerSession
+from db import Profile, normalize_name
+from util.access_token import verify_access_token
 from util.decorators import require_json
+from util.exceptions import InvalidTokenException
+from util.join_waiters import waiting_for_join, wait_timeout, notify_join
 from util.public_profile_details import get_public_profile_details
+from util.session_store import put_session, get_session, discard_session
+from util.token_cache import lookup_token
 
 BARE_BAD_REQUEST = "", 400
 
@@ -23,61 +28,92 @@ def join_mcclient(request: Request):
         # May be inconsistent with official API
         return NULL_MESSAGE.dual
 
-    access_token = AccessToken.from_token(request.json["accessToken"])
-    if access_token is None:
+    try:
+        claims = verify_access_token(request.json["accessToken"])
+    except InvalidTokenException:
         # May be inconsistent with official API
         return INVALID_TOKEN.dual
 
+    access_token = None
+    if claims is None:  # Not judged locally, look it up.
+        access_token = lookup_token(request.json["accessToken"])
+        if access_token is None:
+            # May be inconsistent with official API
+            return INVALID_TOKEN.dual
+
     try:
-        profile = Profile.get(lambda x: x.uuid == UUID(request.json["selectedProfile"]))
+        profile_uuid = UUID(request.json["selectedProfile"])
     except ValueError:
         # May be inconsistent with official API
         return INVALID_UUID.dual
 
-    if access_token.profile != profile:
+    if claims is not None and claims.get("spr") != profile_uuid.hex:
         # May be inconsistent with official API
         return INVALID_TOKEN.dual
 
-    session = MCServerSession.get(lambda x:
-                                  x.profile == profile
-                                  and x.client_side_ip == request.remote_addr
-                                  and x.server_hash == request.json["serverId"])
+    profile = Profile.get(uuid=profile_uuid)
+
+    if profile is None or (access_token is not None and access_token.profile_id != profile.id):
+        # May be inconsistent with official API
+        return INVALID_TOKEN.dual
 
-    if session is None:
-        MCServerSession.select(lambda x: x.profile == profile).delete()
-        MCServerSession(
-            profile=profile,
-            client_side_ip=request.remote_addr,
-            server_hash=request.json["serverId"],
-        )
+    put_session(profile, request.remote_addr, request.json["serverId"])
+    commit()
+    notify_join(profile.name_key, request.json["serverId"])
 
     return "", 204
 
 
-@db_session
 def join_mcserver(request, textures_host):
+    """Answer hasJoined, optionally waiting up to ?wait= milliseconds for the client's join.
+
+    A waiting request blocks the thread serving it until the join is recorded or the wait runs out,
+    it is not an asynchronous wait. Every waiter therefore costs a whole server thread and its stack,
+    which is why util.join_waiters caps them, to 8 by default, and answers the rest without waiting.
+    """
     username, server_hash, ip = request.args.get("username"), request.args.get("serverId"), request.args.get("ip")
     if username is None or server_hash is None:
         # May be inconsistent with official API
         return NULL_MESSAGE.dual
 
+    try:
+        wait = int(request.args.get("wait", 0)) / 1000
+    except ValueError:
+        return BARE_BAD_REQUEST
+
+    if wait <= 0:
+        response = _has_joined(username, server_hash, ip, textures_host)
+    else:
+        # Servers may ask before the client's join lands, wait for it instead of having them retry.
+        # Each check is its own db_session, Pony would answer the second one from its cache otherwise.
+        with waiting_for_join(normalize_name(username), server_hash) as join_event:
+            response = _has_joined(username, server_hash, ip, textures_host)
+            if response is None and join_event is not None and join_event.wait(wait_timeout(wait)):
+                response = _has_joined(username, server_hash, ip, textures_host)
+
+    if response is None:
+        # May be inconsistent with official API
+        return MCSERVER_INVALID_SESSION.dual
+    return response
+
+
+@db_session
+def _has_joined(username, server_hash, ip, textures_host):
+    """:return: Response, or None if the profile has no session on the server"""
     profile = Profile.get_profile_with_name(username)
     if profile is None:
         # May be inconsistent with official API
         return MCSERVER_INVALID_PROFILE.dual
 
-    session = MCServerSession.get(lambda x:
-                                  x.profile == profile
-                                  and x.server_hash == server_hash)
+    client_side_ip = get_session(profile, server_hash)
 
-    if session is None:
-        # May be inconsistent with official API
-        return MCSERVER_INVALID_SESSION.dual
+    if client_side_ip is None:
+        return None
 
-    if ip is not None and session.client_side_ip != ip:
+    if ip is not None and client_side_ip != ip:
         # May be inconsistent with official API
         return MCSERVER_DIFFERENT_IP.dual
 
-    session.delete()
+    discard_session(profile, server_hash)
 
     return jsonify(get_public_profile_details(profile, False, textures_host)), 200
@@ -0,0 +1,7 @@
+from flask import jsonify
+
+from util.token_cache import token_cache_stats
+
+
+def json_and_response_code():
+    return jsonify(token_cache_stats()), 200
@@ -1,14 +1,77 @@
-from flask import send_file
-from pony.orm import db_session
+from datetime import datetime
+from time import time
 
-from paths import TEXTURES_ROOT
+from flask import send_file, Response, jsonify
+from werkzeug.http import is_resource_modified
+
+from util.texture_index import texture_index
+from util.texture_memory_cache import MAX_AGE, cache_headers, get_cached_texture, should_cache_texture, \
+    cache_texture, texture_served, texture_memory_cache_stats
+from util.texture_storage import read_texture
+
+
+def _send(name, entry):
+    """:raise FileNotFoundError: If the texture is gone"""
+    if entry.path is not None:
+        return send_file(str(entry.path), mimetype="image/png", add_etags=False, conditional=False,
+                         cache_timeout=MAX_AGE)
+
+    data = read_texture(entry.kind, name)
+    if data is None:
+        raise FileNotFoundError(f"Texture {name} could not be found")
+    response = Response(bytes(data), mimetype="image/png")  # WSGI servers only take bytes, not memoryviews.
+    response.expires = time() + MAX_AGE
+    return response
+
+
+def _send_cached(request, name, texture):
+    if not is_resource_modified(request.environ, etag=name, last_modified=texture.last_modified):
+        return Response(status=304, headers=texture.not_modified_headers)
+    texture_served(texture)
+    return Response(texture.body, headers=texture.headers)
+
+
+def _load(name, entry, last_modified):
+    """Read a texture into the memory cache.
+
+    :raise FileNotFoundError: If the texture is gone
+    """
+    data = read_texture(entry.kind, name)
+    if data is None:
+        raise FileNotFoundError(f"Texture {name} could not be found")
+    return cache_texture(name, entry.kind, bytes(data), last_modified)
 
 
-@db_session
 def json_and_response_code(request, name):
     """:raise FileNotFoundError: If texture with given name cannot be found"""
-    for group in [subdirectory for subdirectory in TEXTURES_ROOT.iterdir() if subdirectory.is_dir()]:
-        file = group.joinpath(name)
-        if file.exists():
-            return send_file(file, mimetype="image/png")
-    raise FileNotFoundError(f"Texture {name} could not be found")
+    texture = get_cached_texture(name)
+    if texture is not None:
+        return _send_cached(request, name, texture)
+
+    entry = texture_index.resolve(name)
+    if entry is None:
+        raise FileNotFoundError(f"Texture {name} could not be found")
+
+    last_modified = datetime.utcfromtimestamp(int(entry.mtime))
+    if not is_resource_modified(request.environ, etag=name, last_modified=last_modified):
+        return Response(status=304, headers=cache_headers(name, last_modified))
+
+    try:
+        if should_cache_texture(name, entry.size):
+            return _send_cached(request, name, _load(name, entry, last_modified))
+        response = _send(name, entry)
+    except FileNotFoundError:
+        # Moved or deleted by another process since it was indexed.
+        texture_index.remove(name)
+        entry = texture_index.resolve(name)
+        if entry is None:
+            raise
+        response = _send(name, entry)
+
+    for header, value in cache_headers(name, last_modified):
+        response.headers[header] = value
+    return response
+
+
+def stats_json_and_response_code():
+    return jsonify(texture_memory_cache_stats()), 200
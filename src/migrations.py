@@ -0,0 +1,128 @@
+import sqlite3
+
+from paths import DB_PATH
+
+
+def _add_name_keys(connection: sqlite3.Connection):
+    connection.create_function("casefold", 1, str.casefold, deterministic=True)
+
+    connection.execute('ALTER TABLE "Profile" ADD COLUMN "name_key" TEXT NOT NULL DEFAULT \'\'')
+    connection.execute('UPDATE "Profile" SET "name_key" = casefold("name")')
+    connection.execute('CREATE UNIQUE INDEX "unq_profile__name_key" ON "Profile" ("name_key")')
+
+    connection.execute('ALTER TABLE "ProfileNameEvent" ADD COLUMN "name_key" TEXT NOT NULL DEFAULT \'\'')
+    connection.execute('UPDATE "ProfileNameEvent" SET "name_key" = casefold("name")')
+    connection.execute('CREATE INDEX "idx_profilenameevent__name_key" ON "ProfileNameEvent" ("name_key")')
+
+
+def _add_name_event_time_indexes(connection: sqlite3.Connection):
+    # Databases created by Pony after the previous migration already have the single column index only.
+    connection.execute('DROP INDEX IF EXISTS "idx_profilenameevent__name_key"')
+    connection.execute('CREATE INDEX IF NOT EXISTS "idx_profilenameevent__name_key_active_from" '
+                       'ON "ProfileNameEvent" ("name_key", "active_from")')
+    connection.execute('CREATE INDEX IF NOT EXISTS "idx_profilenameevent__profile_active_from" '
+                       'ON "ProfileNameEvent" ("profile", "active_from")')
+
+
+def _share_texture_names(connection: sqlite3.Connection):
+    # Texture names are content addresses now, SQLite can only drop the UNIQUE constraint by rebuilding the tables.
+    connection.execute('CREATE TABLE "ProfileSkin_new" ('
+                       '"id" INTEGER PRIMARY KEY AUTOINCREMENT, '
+                       '"profile" INTEGER NOT NULL REFERENCES "Profile" ("id") ON DELETE CASCADE, '
+                       '"name" TEXT NOT NULL, '
+                       '"model" TEXT NOT NULL)')
+    connection.execute('INSERT INTO "ProfileSkin_new" ("id", "profile", "name", "model") '
+                       'SELECT "id", "profile", "name", "model" FROM "ProfileSkin"')
+    connection.execute('DROP TABLE "ProfileSkin"')
+    connection.execute('ALTER TABLE "ProfileSkin_new" RENAME TO "ProfileSkin"')
+    connection.execute('CREATE INDEX "idx_profileskin__name" ON "ProfileSkin" ("name")')
+    connection.execute('CREATE INDEX "idx_profileskin__profile" ON "ProfileSkin" ("profile")')
+
+    connection.execute('CREATE TABLE "ProfileCape_new" ('
+                       '"id" INTEGER PRIMARY KEY AUTOINCREMENT, '
+                       '"profile" INTEGER NOT NULL REFERENCES "Profile" ("id") ON DELETE CASCADE, '
+                       '"name" TEXT NOT NULL)')
+    connection.execute('INSERT INTO "ProfileCape_new" ("id", "profile", "name") '
+                       'SELECT "id", "profile", "name" FROM "ProfileCape"')
+    connection.execute('DROP TABLE "ProfileCape"')
+    connection.execute('ALTER TABLE "ProfileCape_new" RENAME TO "ProfileCape"')
+    connection.execute('CREATE INDEX "idx_profilecape__name" ON "ProfileCape" ("name")')
+    connection.execute('CREATE INDEX "idx_profilecape__profile" ON "ProfileCape" ("profile")')
+
+
+MIGRATIONS = [  # Append only, PRAGMA user_version stores how many of these were applied.
+    _add_name_keys,
+    _add_name_event_time_indexes,
+    _share_texture_names,
+]
+
+
+# Log which profiles changed, so processes keeping them in memory can catch up with changes made by other processes.
+# Created after Pony created the tables, since Pony does not know about triggers.
+TRIGGERS = {
+    "trg_profile__insert": 'AFTER INSERT ON "Profile" '
+                           'BEGIN INSERT INTO "ProfileChange" ("profile_id") VALUES (NEW."id"); END',
+    "trg_profile__update": 'AFTER UPDATE OF "uuid", "name" ON "Profile" '
+                           'BEGIN INSERT INTO "ProfileChange" ("profile_id") VALUES (NEW."id"); END',
+    "trg_profile__delete": 'AFTER DELETE ON "Profile" '
+                           'BEGIN INSERT INTO "ProfileChange" ("profile_id") VALUES (OLD."id"); END',
+    "trg_profilenameevent__insert": 'AFTER INSERT ON "ProfileNameEvent" '
+                                    'BEGIN INSERT INTO "ProfileChange" ("profile_id") VALUES (NEW."profile"); END',
+    "trg_profilenameevent__update": 'AFTER UPDATE ON "ProfileNameEvent" '
+                                    'BEGIN INSERT INTO "ProfileChange" ("profile_id") VALUES (NEW."profile"); END',
+    "trg_profilenameevent__delete": 'AFTER DELETE ON "ProfileNameEvent" '
+                                    'BEGIN INSERT INTO "ProfileChange" ("profile_id") VALUES (OLD."profile"); END',
+}
+
+
+def create_triggers(path=DB_PATH) -> int:
+    """Create the triggers which are missing from the database.
+
+    :param path: Path of the SQLite database
+    :return: Amount of triggers created
+    """
+    connection = sqlite3.connect(str(path), isolation_level=None)
+    try:
+        existing = {row[0] for row in connection.execute("SELECT name FROM sqlite_master WHERE type = 'trigger'")}
+        missing = [name for name in TRIGGERS if name not in existing]
+        if missing:
+            connection.execute("BEGIN IMMEDIATE")
+            for name in missing:
+                connection.execute(f'CREATE TRIGGER IF NOT EXISTS "{name}" {TRIGGERS[name]}')
+            connection.execute("COMMIT")
+        return len(missing)
+    finally:
+        connection.close()
+
+
+def migrate(path=DB_PATH) -> int:
+    """Bring the schema of an existing database up to date.
+
+    Must run before Pony maps the database, since mapping fails on missing columns.
+    A database without tables is marked up to date, Pony creates the tables in their latest form.
+
+    :param path: Path of the SQLite database
+    :return: Amount of migrations applied
+    """
+    connection = sqlite3.connect(str(path), isolation_level=None)
+    try:
+        version = connection.execute("PRAGMA user_version").fetchone()[0]
+        has_tables = connection.execute("SELECT COUNT(*) FROM sqlite_master WHERE type = 'table'").fetchone()[0] > 0
+
+        if not has_tables:
+            connection.execute(f"PRAGMA user_version = {len(MIGRATIONS)}")
+            return 0
+
+        for index, migration in enumerate(MIGRATIONS[version:], start=version + 1):
+            connection.execute("BEGIN IMMEDIATE")
+            try:
+                migration(connection)
+                connection.execute(f"PRAGMA user_version = {index}")
+            except BaseException:
+                connection.execute("ROLLBACK")
+                raise
+            connection.execute("COMMIT")
+
+        return max(0, len(MIGRATIONS) - version)
+    finally:
+        connection.close()
@@ -9,6 +9,9 @@ DB_PATH = DATA_ROOT.joinpath("tmp.sqlite3")
 TEXTURES_ROOT = DATA_ROOT.joinpath("textures")
 SKINS_ROOT = TEXTURES_ROOT.joinpath("skins")
 CAPES_ROOT = TEXTURES_ROOT.joinpath("capes")
+TEXTURE_PACK_PATH = TEXTURES_ROOT.joinpath("textures.pack")
+TEXTURE_PACK_INDEX_PATH = TEXTURES_ROOT.joinpath("textures.idx")
+TEXTURE_PACK_LOCK_PATH = TEXTURES_ROOT.joinpath("textures.lock")
 
 RESOURCES_ROOT = PROJECT_ROOT.joinpath("res")
 
@@ -22,6 +25,17 @@ ROOT_PRIVATE_KEY_PATH = CRYPTO_ROOT.joinpath("root.key")
 ROOT_PUBLIC_KEY_PATH = CRYPTO_ROOT.joinpath("root.pub")
 ROOT_CERTIFICATE_PATH = CRYPTO_ROOT.joinpath("root.crt")
 
+TOKEN_KEY_PATH = CRYPTO_ROOT.joinpath("token.key")
+
+TEXTURES_PRIVATE_KEY_PATH = CRYPTO_ROOT.joinpath("textures.key")
+TEXTURES_PUBLIC_KEY_PATH = CRYPTO_ROOT.joinpath("textures.pub")
+
+SHARDED_ROOTS = [  # Textures are kept in <root>/ab/cd/abcd..., the first level is created by setup().
+    SKINS_ROOT,
+    CAPES_ROOT,
+]
+SHARD_LENGTH = 2
+
 ROOTS = [
     PROJECT_ROOT,
     DATA_ROOT,
@@ -33,6 +47,48 @@ ROOTS = [
 ]
 
 
+def texture_path(root: pathlib.Path, name: str) -> pathlib.Path:
+    """Get where a texture is stored.
+
+    Names too short or odd to shard stay directly in root.
+
+    :param root: SKINS_ROOT or CAPES_ROOT
+    :param name: Name of the texture
+    """
+    if len(name) < 2 * SHARD_LENGTH or not name[:2 * SHARD_LENGTH].isalnum():
+        return root.joinpath(name)
+    return root.joinpath(name[:SHARD_LENGTH], name[SHARD_LENGTH:2 * SHARD_LENGTH], name)
+
+
+def texture_paths(root: pathlib.Path, name: str) -> list:
+    """Get where a texture may be stored, the sharded path first, then the flat path used before sharding.
+
+    :param root: SKINS_ROOT or CAPES_ROOT
+    :param name: Name of the texture
+    """
+    path = texture_path(root, name)
+    flat_path = root.joinpath(name)
+    return [path] if path == flat_path else [path, flat_path]
+
+
+def iter_texture_files(root: pathlib.Path):
+    """Iterate over the texture files in root, in both the sharded and the flat layout.
+
+    Skips temporary files, whose names start with a dot.
+
+    :param root: SKINS_ROOT or CAPES_ROOT
+    """
+    for path in root.iterdir():
+        if path.name.startswith("."):
+            continue
+        if path.is_dir():
+            for file in path.glob("*/*"):
+                if not file.name.startswith(".") and file.is_file():
+                    yield file
+        elif path.is_file():
+            yield path
+
+
 def setup():
     for root in ROOTS:
         try:
@@ -40,6 +96,13 @@ def setup():
         except FileExistsError:
             pass
 
+    for root in SHARDED_ROOTS:
+        for index in range(16 ** SHARD_LENGTH):
+            try:
+                root.joinpath(f"{index:0{SHARD_LENGTH}x}").mkdir()
+            except FileExistsError:
+                pass
+
 
 if __name__ == '__main__':
     setup()
@@ -0,0 +1,30 @@
+from argparse import ArgumentParser
+
+from pony.orm import db_session, select
+
+from db import ProfileSkin, ProfileCape
+from util.texture_storage import PackTextureStorage, detect_backend
+
+
+def call(program, argv):
+    parser = ArgumentParser(prog=program, description="Reclaim the space of deleted textures from the texture pack. "
+                                                      "Safe to run while the servers are up.")
+    parser.add_argument("--drop-unreferenced", action="store_true",
+                        help="also drop packed textures no profile uses, database writes wait until it is done")
+
+    args = parser.parse_args(argv)
+
+    if detect_backend() != "pack":
+        print("There is no texture pack.")
+        exit(1)
+
+    if args.drop_unreferenced:
+        # Uploads store the texture while holding the database write lock, and commit after.
+        # Holding it until the pack is rewritten means every stored texture is either in keep or not yet stored.
+        with db_session(immediate=True):
+            keep = {("skin", name) for name in select(x.name for x in ProfileSkin)} | \
+                   {("cape", name) for name in select(x.name for x in ProfileCape)}
+            size_before, size_after = PackTextureStorage().compact(keep)
+    else:
+        size_before, size_after = PackTextureStorage().compact()
+    print(f"Texture pack: {size_before} -> {size_after} bytes.")
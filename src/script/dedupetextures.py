@@ -0,0 +1,81 @@
+from argparse import ArgumentParser
+
+from PIL import Image, UnidentifiedImageError
+from pony.orm import db_session, select
+from pony.orm.core import commit
+
+from db import ProfileSkin, ProfileCape
+from paths import SKINS_ROOT, CAPES_ROOT, texture_path, texture_paths, iter_texture_files
+from util.textures import texture_hash, write_texture
+
+KINDS = [
+    ("skins", ProfileSkin, SKINS_ROOT),
+    ("capes", ProfileCape, CAPES_ROOT),
+]
+
+
+def _content_address(root, name):
+    """Make sure the content addressed copy of a texture exists.
+
+    :return: Content address, or None if the texture could not be read
+    """
+    path = next((path for path in texture_paths(root, name) if path.is_file()), None)
+    if path is None:
+        return None
+
+    try:
+        with Image.open(path) as image:
+            new_name = texture_hash(image)
+    except (UnidentifiedImageError, ValueError):
+        return None
+
+    if new_name != name and not any(new_path.exists() for new_path in texture_paths(root, new_name)):
+        write_texture(path.read_bytes(), texture_path(root, new_name))
+    return new_name
+
+
+def call(program, argv):
+    parser = ArgumentParser(prog=program, description="Rename textures to their content address and merge duplicates. "
+                                                      "Safe to run again after being interrupted. "
+                                                      "Stop the servers first, --delete-orphans would delete uploads "
+                                                      "in progress.")
+    parser.add_argument("--delete-orphans", help="delete texture files no profile uses", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    for kind, entity, root in KINDS:
+        with db_session:
+            rows = select((x.id, x.name) for x in entity)[:]
+
+        renames = {}
+        for name in {name for _, name in rows}:
+            new_name = _content_address(root, name)
+            if new_name is None:
+                print(f"Could not read {kind[:-1]} {name}, leaving it as is.")
+            elif new_name != name:
+                renames[name] = new_name
+
+        with db_session:
+            for row_id, name in rows:
+                if name in renames:
+                    entity[row_id].name = renames[name]
+            commit()
+
+        for name in renames:
+            for path in texture_paths(root, name):
+                try:
+                    path.unlink()
+                except FileNotFoundError:
+                    pass
+
+        orphans = []
+        if args.delete_orphans:
+            with db_session:
+                used = set(select(x.name for x in entity))
+            for path in iter_texture_files(root):
+                if path.name not in used:
+                    path.unlink()
+                    orphans.append(path.name)
+
+        unique = len({renames.get(name, name) for _, name in rows})
+        print(f"{kind}: {len(rows)} rows use {unique} files, renamed {len(renames)}, deleted {len(orphans)} orphans.")
@@ -4,6 +4,8 @@ from flask import Flask, request
 
 import handler.textures.get_texture
 import handler.error
+from util.texture_index import load_texture_index
+from util.texture_memory_cache import configure as configure_texture_memory_cache
 
 
 def call(program, argv):
@@ -13,6 +15,11 @@ def call(program, argv):
     parser.add_argument("-p", "--port", default=80, type=int)
     parser.add_argument("-d", "--debug", action="store_true")
     parser.add_argument("-t", "--threaded", action="store_true")
+    parser.add_argument("--memory-cache-bytes", help="maximum bytes of textures kept in memory, 0 to disable",
+                        default=16 * 1024 * 1024, type=int)
+    parser.add_argument("--memory-cache-admit-after", help="requests for a texture before it is kept in memory",
+                        default=2, type=int)
+    parser.add_argument("--cache-stats", help="serve memory cache statistics at /texture-cache", action="store_true")
 
     args = parser.parse_args(argv)
 
@@ -43,4 +50,12 @@ def call(program, argv):
     def http_get_texture(name):
         return handler.textures.get_texture.json_and_response_code(request, name)
 
+    if args.cache_stats:
+        @app.route("/texture-cache", methods=["GET"], host=args.textures_host)
+        def http_get_texture_cache_stats():
+            return handler.textures.get_texture.stats_json_and_response_code()
+
+    configure_texture_memory_cache(max_bytes=args.memory_cache_bytes, admit_after=args.memory_cache_admit_after)
+    load_texture_index()
+
     app.run(host=args.textures_host, port=args.port, debug=args.debug, threaded=args.threaded)
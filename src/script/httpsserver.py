@@ -12,14 +12,28 @@ import handler.authserver.refresh
 import handler.authserver.validate
 import handler.authserver.signout
 import handler.authserver.invalidate
+import handler.sessionserver.get_profiles
 import handler.sessionserver.get_skin_cape
 import handler.sessionserver.mcserver_auth
 import handler.status.check
+import handler.status.token_cache
 import handler.error
 
 from paths import HTTP_PRIVATE_KEY_PATH, HTTP_CERTIFICATE_PATH, setup as setup_paths
 from util.crypto.httpcert import create_and_write_http_keys, create_and_write_csr, issue_and_write_certificate
 from util.crypto.rootca import create_and_write_root_certificate
+from util.crypto.textureskey import create_and_write_textures_keys
+from util.crypto.tokenkey import create_and_write_token_key
+from util.password import configure as configure_password_pool
+from util.texture_pool import configure as configure_texture_pool
+from util.name_timeline import load_name_timeline
+from util.join_waiters import configure as configure_join_waiters, DEFAULT_MAX_WAITERS
+from util.session_store import configure as configure_session_store
+from util.texture_fetch import configure as configure_texture_fetch
+from util.textures_property import configure as configure_textures_property
+from util.textures_signature import configure as configure_textures_signature
+from util.sweeper import start_sweeper
+from util.token_cache import configure as configure_token_cache
 
 
 def call(program, argv):
@@ -32,12 +46,49 @@ def call(program, argv):
     parser.add_argument("-p", "--port", default=443, type=int)
     parser.add_argument("-d", "--debug", action="store_true")
     parser.add_argument("-t", "--threaded", action="store_true")
+    parser.add_argument("--hash-workers", help="password hashing processes, defaults to CPU count", type=int)
+    parser.add_argument("--hash-queue", help="maximum queued password hashing jobs", default=64, type=int)
+    parser.add_argument("--hash-timeout", help="seconds to wait for password hashing", default=10.0, type=float)
+    parser.add_argument("--texture-workers", help="texture processing processes, defaults to CPU count", type=int)
+    parser.add_argument("--texture-queue", help="maximum queued texture uploads", default=32, type=int)
+    parser.add_argument("--texture-timeout", help="seconds to wait for texture processing", default=10.0, type=float)
+    parser.add_argument("--sweep-interval", help="seconds between expired row sweeps, 0 to disable",
+                        default=3600.0, type=float)
+    parser.add_argument("--sweep-batch", help="maximum rows deleted per sweep transaction", default=500, type=int)
+    parser.add_argument("--token-cache-size", help="maximum cached access tokens", default=4096, type=int)
+    parser.add_argument("--token-cache-ttl", help="seconds an access token stays cached", default=60.0, type=float)
+    parser.add_argument("--cache-stats", help="serve access token cache statistics at /token-cache on the status host",
+                        action="store_true")
+    parser.add_argument("--profile-lookup-limit", help="maximum names per /profiles/minecraft call",
+                        default=handler.api.get_uuids.DEFAULT_LIMIT, type=int)
+    parser.add_argument("--bulk-profile-limit", help="maximum UUIDs per /session/minecraft/profiles call",
+                        default=handler.sessionserver.get_profiles.DEFAULT_LIMIT, type=int)
+    parser.add_argument("--name-timeline", help="answer past name owners from memory", action="store_true")
+    parser.add_argument("--name-timeline-refresh", help="seconds between checks for renamed or new profiles",
+                        default=5.0, type=float)
+    parser.add_argument("--session-store", help="where join sessions are kept", default="memory",
+                        choices=["memory", "database"])
+    parser.add_argument("--session-ttl", help="seconds a join session is kept in memory", default=30.0, type=float)
+    parser.add_argument("--join-waiters", help="maximum hasJoined requests waiting for a join at once, each holding "
+                                               "a thread, 0 to disable, needs --threaded",
+                        default=DEFAULT_MAX_WAITERS, type=int)
+    parser.add_argument("--join-max-wait", help="maximum seconds a hasJoined request may wait for a join",
+                        default=5.0, type=float)
+    parser.add_argument("--textures-cache-size", help="maximum cached textures properties", default=8192, type=int)
+    parser.add_argument("--textures-granularity", help="seconds an encoded textures property is reused",
+                        default=60.0, type=float)
+    parser.add_argument("--texture-fetch-max-bytes", help="maximum size of a skin downloaded from a URL",
+                        default=64 * 1024, type=int)
+    parser.add_argument("--texture-fetch-timeout", help="seconds a skin download from a URL may take",
+                        default=10.0, type=float)
+    parser.add_argument("--texture-fetch-cache-size", help="maximum cached skin downloads", default=256, type=int)
+    parser.add_argument("--signature-cache-size", help="maximum cached textures signatures", default=8192, type=int)
 
     args = parser.parse_args(argv)
 
     app = Flask(__name__, host_matching=True, static_host=args.api_host)
     app.config.update(
-        MAX_CONTENT_LENGTH=16 * 1024,  # 16 kB
+        MAX_CONTENT_LENGTH=32 * 1024,  # 32 kB, fits 500 dashed UUIDs for /session/minecraft/profiles
     )
 
     # region Common
@@ -69,7 +120,7 @@ def call(program, argv):
 
     @app.route("/profiles/minecraft", methods=["POST"], host=args.api_host)
     def http_get_uuids():
-        return handler.api.get_uuids.json_and_response_code(request)
+        return handler.api.get_uuids.json_and_response_code(request, args.profile_lookup_limit)
 
     @app.route("/user/profile/<uuid>/skin", methods=["POST", "PUT", "DELETE"], host=args.api_host)
     def http_change_skin(uuid):
@@ -111,6 +162,11 @@ def call(program, argv):
     def http_get_skin_cape(uuid):
         return handler.sessionserver.get_skin_cape.json_and_response_code(request, uuid, args.textures_host)
 
+    @app.route("/session/minecraft/profiles", methods=["POST"], host=args.sessionserver_host)
+    def http_get_profiles():
+        return handler.sessionserver.get_profiles.json_and_response_code(request, args.textures_host,
+                                                                          args.bulk_profile_limit)
+
     @app.route("/blockedservers", methods=["GET"], host=args.sessionserver_host)
     def http_get_blocked_servers():
         return "", 200
@@ -128,10 +184,35 @@ def call(program, argv):
     @app.route("/check", methods=["GET"], host=args.status_host)
     def http_get_status():
         return handler.status.check.json_and_response_code(request)
+
+    if args.cache_stats:
+        @app.route("/token-cache", methods=["GET"], host=args.status_host)
+        def http_get_token_cache_stats():
+            return handler.status.token_cache.json_and_response_code()
     # endregion
 
     setup_paths()
 
+    configure_password_pool(max_workers=args.hash_workers, max_queued=args.hash_queue, timeout=args.hash_timeout)
+    configure_texture_pool(max_workers=args.texture_workers, max_queued=args.texture_queue,
+                           timeout=args.texture_timeout)
+
+    configure_token_cache(max_size=args.token_cache_size, ttl=args.token_cache_ttl)
+
+    configure_session_store(backend=args.session_store, ttl=args.session_ttl)
+    # A waiting hasJoined request holds its thread, without other threads the join it waits for is never served.
+    configure_join_waiters(max_waiters=args.join_waiters if args.threaded else 0, max_wait=args.join_max_wait)
+    configure_textures_property(max_size=args.textures_cache_size, granularity=args.textures_granularity)
+    configure_textures_signature(max_size=args.signature_cache_size)
+    configure_texture_fetch(max_bytes=args.texture_fetch_max_bytes, deadline=args.texture_fetch_timeout,
+                            cache_size=args.texture_fetch_cache_size)
+
+    if args.name_timeline:
+        load_name_timeline(refresh_interval=args.name_timeline_refresh)
+
+    if args.sweep_interval > 0:
+        start_sweeper(args.sweep_interval, args.sweep_batch)
+
     create_and_write_root_certificate(overwrite=False)
     http_certificate_private_key = create_and_write_http_keys(overwrite=False)
     http_certificate_request = create_and_write_csr(
@@ -145,6 +226,8 @@ def call(program, argv):
         overwrite=True
     )
     issue_and_write_certificate(http_certificate_request, overwrite=True)
+    create_and_write_token_key(overwrite=False)
+    create_and_write_textures_keys(overwrite=False)
 
     context = (str(HTTP_CERTIFICATE_PATH), str(HTTP_PRIVATE_KEY_PATH))
     app.run(host=args.api_host, port=args.port, debug=args.debug, threaded=args.threaded, ssl_context=context)
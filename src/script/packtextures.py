@@ -0,0 +1,27 @@
+from argparse import ArgumentParser
+
+from paths import iter_texture_files
+from util.texture_storage import KIND_ROOTS, PackTextureStorage
+
+
+def call(program, argv):
+    parser = ArgumentParser(prog=program, description="Move texture files into the texture pack. "
+                                                      "The servers use the pack once it exists, after a restart. "
+                                                      "Restart them, then run again with --remove-files.")
+    parser.add_argument("--remove-files", help="delete texture files once they are in the pack", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    storage = PackTextureStorage()
+
+    for kind, root in KIND_ROOTS.items():
+        packed, removed = 0, 0
+
+        for path in iter_texture_files(root):
+            if storage.pack(kind, path.name, path.read_bytes()):
+                packed += 1
+            if args.remove_files:
+                path.unlink()
+                removed += 1
+
+        print(f"{kind}s: packed {packed} files, removed {removed} files.")
@@ -1,7 +1,6 @@
 import argparse
 
 from pony.orm import db_session
-from pony.orm.core import desc
 
 from db import Profile, ProfileNameEvent
 
@@ -23,8 +22,5 @@ def call(program, argv):
     print(f"History of {profile}")
     print(f"Current name styles: {profile.name}, {profile.name_upper}, {profile.name_lower}")
 
-    for event in profile.profile_name_events.order_by(desc(ProfileNameEvent.active_from)):
-        if args.unix:
-            print(event.repr_timestamp())
-        else:
-            print(event)
+    for index, event in reversed(list(enumerate(ProfileNameEvent.history(profile.uuid)))):
+        print(event.describe(is_initial=index == 0, timestamp=args.unix))
@@ -3,7 +3,7 @@ from datetime import datetime
 
 from pony.orm import db_session, desc
 
-from db import Profile, ProfileNameEvent
+from db import Profile, ProfileNameEvent, normalize_name
 
 
 @db_session
@@ -28,9 +28,8 @@ def call(program, argv):
     else:
         print(f"Owner of {event.name} @ {args.time}: {event.profile}")
 
-    events = ProfileNameEvent.select(lambda x: x.name == args.name
-                                     or x.name_upper == args.name.upper()
-                                     or x.name_lower == args.name.lower())\
+    name_key = normalize_name(args.name)
+    events = ProfileNameEvent.select(lambda x: x.name_key == name_key)\
         .order_by(desc(ProfileNameEvent.active_from))
 
     for old_event in events:
@@ -2,13 +2,15 @@ from argparse import ArgumentParser
 from io import BytesIO
 from pathlib import Path
 
-from PIL import Image, UnidentifiedImageError
 from pony.orm import db_session
 from pony.orm.core import commit
-from requests import get
 
 from constant.error import INVALID_IMAGE, INVALID_SKIN
 from db import Profile
+from util.exceptions import TextureFetchException, InvalidImageException, PoolBusyException
+from util.png_header import SKIN_SIZES, check_png_stream
+from util.texture_fetch import fetch_texture
+from util.texture_pool import prepare_texture
 
 
 @db_session
@@ -32,9 +34,23 @@ def call(program, argv):
         exit(1)
 
     if args.url is not None:
-        fd = BytesIO(get(args.url).content)
+        try:
+            fd = BytesIO(fetch_texture(args.url, SKIN_SIZES))
+        except TextureFetchException as e:
+            print(e)
+            exit(1)
+        except InvalidImageException:
+            print(INVALID_IMAGE.message)
+            exit(1)
+        except ValueError:
+            print(INVALID_SKIN.message)
+            exit(1)
     elif args.path is not None:
-        fd = Path(args.path)
+        try:
+            fd = Path(args.path).open("rb")
+        except OSError:
+            print(INVALID_IMAGE.message)
+            exit(1)
     elif not args.delete:
         print("You must specify a file!")
         exit(1)
@@ -43,16 +59,27 @@ def call(program, argv):
         profile.reset_skin()
     else:
         try:
-            image: Image = Image.open(fd)
-        except (FileNotFoundError, UnidentifiedImageError, ValueError):
+            check_png_stream(fd, SKIN_SIZES)
+        except InvalidImageException:
             print(INVALID_IMAGE.message)
             exit(1)
+        except ValueError:
+            print(INVALID_SKIN.message)
+            exit(1)
 
         try:
-            profile.update_skin(image, "slim" if args.slim else "")
+            name, data = prepare_texture(fd.read(), SKIN_SIZES)
+        except InvalidImageException:
+            print(INVALID_IMAGE.message)
+            exit(1)
         except ValueError:
             print(INVALID_SKIN.message)
             exit(1)
+        except PoolBusyException as e:
+            print(e)
+            exit(1)
+
+        profile.update_skin(name, data, "slim" if args.slim else "")
 
     try:
         commit()
@@ -0,0 +1,44 @@
+from argparse import ArgumentParser
+
+from PIL import Image, UnidentifiedImageError
+
+from paths import SKINS_ROOT, CAPES_ROOT, iter_texture_files
+from util.textures import normalize_texture, encode_texture, write_texture
+
+ROOTS = [
+    ("skins", SKINS_ROOT),
+    ("capes", CAPES_ROOT),
+]
+
+
+def call(program, argv):
+    parser = ArgumentParser(prog=program, description="Normalize and recompress existing texture files in place. "
+                                                      "Files only get replaced if the result is smaller.")
+    parser.add_argument("-n", "--dry-run", help="only report the savings", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    for kind, root in ROOTS:
+        files, replaced, size_before, size_after = 0, 0, 0, 0
+
+        for path in iter_texture_files(root):
+            try:
+                with Image.open(path) as image:
+                    data = encode_texture(normalize_texture(image))
+            except (UnidentifiedImageError, ValueError, OSError):
+                print(f"Could not read {kind[:-1]} {path.name}, leaving it as is.")
+                continue
+
+            files += 1
+            old_size = path.stat().st_size
+            size_before += old_size
+            if len(data) < old_size:
+                replaced += 1
+                size_after += len(data)
+                if not args.dry_run:
+                    write_texture(data, path)
+            else:
+                size_after += old_size
+
+        print(f"{kind}: {'would replace' if args.dry_run else 'replaced'} {replaced} of {files} files, "
+              f"{size_before} -> {size_after} bytes.")
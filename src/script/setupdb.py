@@ -1,2 +1,5 @@
+from migrations import migrate
+
+
 def call(program, argv):
-    pass
+    print(f"Applied {migrate()} migrations.")
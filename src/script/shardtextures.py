@@ -0,0 +1,47 @@
+from argparse import ArgumentParser
+from os import link
+
+from paths import SKINS_ROOT, CAPES_ROOT, setup as setup_paths, texture_path
+
+ROOTS = [
+    ("skins", SKINS_ROOT),
+    ("capes", CAPES_ROOT),
+]
+
+
+def call(program, argv):
+    parser = ArgumentParser(prog=program, description="Move textures from the flat layout into their shard "
+                                                      "directories. Safe to run while the servers are up and to run "
+                                                      "again after being interrupted.")
+    parser.add_argument("-n", "--dry-run", help="only count the textures to move", action="store_true")
+
+    args = parser.parse_args(argv)
+
+    setup_paths()
+
+    for kind, root in ROOTS:
+        moved, already_there = 0, 0
+
+        for path in list(root.iterdir()):
+            if path.name.startswith(".") or not path.is_file():
+                continue
+
+            new_path = texture_path(root, path.name)
+            if new_path == path:
+                continue
+
+            if args.dry_run:
+                moved += 1
+                continue
+
+            new_path.parent.mkdir(parents=True, exist_ok=True)
+            try:
+                # Linked before unlinking, so readers find the texture at either path throughout.
+                link(path, new_path)
+                moved += 1
+            except FileExistsError:
+                already_there += 1
+            path.unlink()
+
+        print(f"{kind}: {'would move' if args.dry_run else 'moved'} {moved} files, "
+              f"{already_there} were already in their shard.")
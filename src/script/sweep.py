@@ -0,0 +1,13 @@
+import argparse
+
+from util.sweeper import sweep_expired, format_report
+
+
+def call(program, argv):
+    parser = argparse.ArgumentParser(prog=program)
+
+    parser.add_argument("-b", "--batch-size", help="maximum rows deleted per transaction", default=500, type=int)
+
+    args = parser.parse_args(argv)
+
+    print(format_report(sweep_expired(args.batch_size)))
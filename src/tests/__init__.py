@@ -0,0 +1,31 @@
+"""Tests and benchmarks, run from src:
+
+    python -m unittest discover tests
+    python -m tests.bench_revocation
+    python -m tests.bench_name_lookup
+
+Importing this package points the database to a temporary file, so it has to happen before db is imported.
+"""
+from atexit import register as register_exit
+from contextlib import contextmanager
+from pathlib import Path
+from tempfile import mkdtemp
+from shutil import rmtree
+from unittest.mock import patch
+
+import paths
+
+_database_root = mkdtemp(prefix="nepojang-tests-")
+register_exit(rmtree, _database_root, ignore_errors=True)
+paths.DB_PATH = Path(_database_root).joinpath("tests.sqlite3")
+
+
+@contextmanager
+def count_statements():
+    """Count the SQL statements Pony executes inside the block.
+
+    :return: Mock of Database._exec_sql, its call_count is the amount of statements
+    """
+    from db import db
+    with patch.object(db, "_exec_sql", wraps=db._exec_sql) as exec_sql:
+        yield exec_sql
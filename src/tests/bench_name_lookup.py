@@ -0,0 +1,86 @@
+"""Benchmark looking up profiles by case-insensitive name in a large database.
+
+    python -m tests.bench_name_lookup [--profiles 1000000]
+
+Profiles are inserted with plain SQL, going through Pony would take far longer than the lookups.
+Creating a million of them still takes about a minute.
+"""
+from argparse import ArgumentParser
+from random import Random
+from statistics import median, quantiles
+from time import perf_counter
+from uuid import uuid4
+
+from tests import count_statements
+from pony.orm import db_session
+
+from db import db, Account, Profile, normalize_name
+
+INSERT_CHUNK_SIZE = 50000
+
+
+def profile_name(index: int) -> str:
+    return f"Player_{index:07d}"
+
+
+@db_session
+def create_profiles(amount: int):
+    account = Account(username="bench@example.com", password="-")
+    db.flush()
+    connection = db.get_connection()
+    for start in range(0, amount, INSERT_CHUNK_SIZE):
+        rows = []
+        for index in range(start, min(start + INSERT_CHUNK_SIZE, amount)):
+            name = profile_name(index)
+            rows.append((uuid4().bytes, account.id, "minecraft",
+                         name, name.upper(), name.lower(), normalize_name(name)))
+        connection.executemany("""
+            INSERT INTO "Profile" ("uuid", "account", "agent", "name", "name_upper", "name_lower", "name_key")
+            VALUES (?, ?, ?, ?, ?, ?, ?)
+        """, rows)
+
+
+def query_plan() -> str:
+    with db_session:  # db.select() only runs SELECT statements.
+        rows = db.get_connection().execute("""
+            EXPLAIN QUERY PLAN SELECT * FROM "Profile" WHERE "name_key" = 'player_0000000'
+        """).fetchall()
+    return "; ".join(row[-1] for row in rows)
+
+
+def lookup(name: str):
+    """:return: (seconds, statements, found)"""
+    with count_statements() as exec_sql:
+        start = perf_counter()
+        with db_session:
+            found = Profile.get_profile_with_name(name) is not None
+        return perf_counter() - start, exec_sql.call_count, found
+
+
+def main():
+    parser = ArgumentParser(prog="bench_name_lookup", description=__doc__.splitlines()[0])
+    parser.add_argument("--profiles", type=int, default=1000000, help="amount of profiles to create")
+    parser.add_argument("--lookups", type=int, default=10000, help="amount of names to look up")
+    args = parser.parse_args()
+
+    start = perf_counter()
+    create_profiles(args.profiles)
+    print(f"Created {args.profiles} profiles in {perf_counter() - start:.1f} seconds.")
+    print(f"Query plan: {query_plan()}")
+
+    random = Random(0)
+    names = [profile_name(random.randrange(args.profiles)).swapcase() for _ in range(args.lookups)]
+    names += [f"Missing_{index}" for index in range(args.lookups // 10)]
+    random.shuffle(names)
+
+    results = [lookup(name) for name in names]
+    seconds = [result[0] * 1000 for result in results]
+    assert sum(result[2] for result in results) == args.lookups, "Every existing name must be found."
+
+    print(f"{len(names)} lookups, {args.lookups} hits")
+    print(f"median {median(seconds):.3f} ms, p99 {quantiles(seconds, n=100)[-1]:.3f} ms, "
+          f"max {max(seconds):.3f} ms, statements per lookup {max(result[1] for result in results)}")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,62 @@
+"""Benchmark revoking an account's access tokens against the amount of tokens it has.
+
+    python -m tests.bench_revocation [--counts 10 100 1000 10000]
+
+Other accounts hold as many tokens again, so a scan over the whole table would show.
+"""
+from argparse import ArgumentParser
+from statistics import median
+from time import perf_counter
+
+from tests import count_statements
+from pony.orm import db_session, commit
+
+from db import Account, ClientToken, AccessToken
+
+TOKENS_PER_CLIENT = 10
+
+
+@db_session
+def create_account(username: str, tokens: int) -> int:
+    """:return: ID of a new account with tokens AccessTokens"""
+    account = Account(username=username, password="-")
+    client = None
+    for index in range(tokens):
+        if index % TOKENS_PER_CLIENT == 0:
+            client = ClientToken(account=account)
+        AccessToken(client_token=client)
+    commit()
+    return account.id
+
+
+def revoke(account_id: int):
+    """:return: (seconds, statements)"""
+    with count_statements() as exec_sql:
+        start = perf_counter()
+        with db_session:
+            Account[account_id].invalidate_access_tokens()
+        return perf_counter() - start, exec_sql.call_count
+
+
+def main():
+    parser = ArgumentParser(prog="bench_revocation", description=__doc__.splitlines()[0])
+    parser.add_argument("--counts", type=int, nargs="+", default=[10, 100, 1000, 10000],
+                        help="amounts of access tokens to revoke")
+    parser.add_argument("--repeat", type=int, default=5, help="revocations timed per amount")
+    args = parser.parse_args()
+
+    print(f"{'tokens':>8} {'median ms':>10} {'statements':>10}")
+    for count in args.counts:
+        create_account(f"other-{count}@example.com", count)
+        account_id = create_account(f"bench-{count}@example.com", count)
+        results = [revoke(account_id) for _ in range(args.repeat)]
+        seconds = median(result[0] for result in results)
+        print(f"{count:>8} {seconds * 1000:>10.2f} {results[-1][1]:>10}")
+
+        with db_session:
+            assert not AccessToken.select(lambda x: x.client_token.account.id == account_id
+                                          and x.authentication_valid).exists()
+
+
+if __name__ == "__main__":
+    main()
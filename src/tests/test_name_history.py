@@ -0,0 +1,43 @@
+from unittest import TestCase
+from uuid import uuid4
+
+from flask import Flask
+from pony.orm import db_session
+
+from tests import count_statements
+from db import Account, Profile
+from handler.api import get_name_history
+
+
+class NameHistoryQueryCountTest(TestCase):
+    @classmethod
+    def setUpClass(cls):
+        cls.app = Flask(__name__)
+
+    @staticmethod
+    @db_session
+    def create_profile(renames: int):
+        """:return: UUID of a new profile which was renamed renames times"""
+        suffix = uuid4().hex[:8]
+        account = Account(username=f"{suffix}@example.com", password="-")
+        profile = Profile.create(account=account, agent="minecraft", name=f"Name{suffix}")
+        for index in range(renames):
+            profile.change_name(f"N{index}{suffix}")
+        return profile.uuid
+
+    def statements_for(self, renames: int) -> int:
+        uuid = self.create_profile(renames)
+        with self.app.app_context(), count_statements() as exec_sql:
+            response, status = get_name_history.json_and_response_code(uuid.hex)
+        self.assertEqual(status, 200)
+        self.assertEqual(len(response.get_json()), renames + 1)
+        return exec_sql.call_count
+
+    def test_statements_do_not_grow_with_renames(self):
+        self.statements_for(0)  # Compile the queries first.
+        counts = {renames: self.statements_for(renames) for renames in (0, 1, 10, 100)}
+        self.assertEqual(len(set(counts.values())), 1, f"Statements per amount of renames: {counts}")
+
+    def test_unknown_profile(self):
+        with self.app.app_context():
+            self.assertEqual(get_name_history.json_and_response_code(uuid4().hex), ("", 204))
@@ -0,0 +1,128 @@
+from calendar import timegm
+from threading import Lock
+from time import time
+
+from jwt import encode as jwt_encode, decode as jwt_decode, exceptions as jwt_exceptions
+
+from util.crypto.tokenkey import create_and_write_token_key
+from util.exceptions import InvalidTokenException
+
+ALGORITHM = "HS256"
+PRUNE_INTERVAL = 60  # seconds
+
+_token_key = None
+_token_key_lock = Lock()
+
+
+def _get_token_key() -> bytes:
+    global _token_key
+    with _token_key_lock:
+        if _token_key is None:
+            _token_key = create_and_write_token_key(overwrite=False)
+        return _token_key
+
+
+class RevocationSet:
+    """Access tokens revoked by this process.
+
+    Only tokens issued after the set was created can be checked against it, earlier tokens may have been
+    revoked by a previous run. Those still have to be looked up in the database.
+    """
+
+    def __init__(self):
+        self.trusted_since = int(time())
+
+        self._tokens = {}  # yggt -> exp
+        self._accounts = {}  # sub -> (revoked at, yggts issued in the same second which stay valid)
+        self._lock = Lock()
+        self._last_prune = time()
+
+    def revoke_token(self, access_token):
+        """Revoke a single token until it expires.
+
+        :param db.AccessToken access_token: AccessToken to revoke
+        """
+        with self._lock:
+            self._tokens[access_token.uuid.hex] = timegm(access_token.expiry_utc.utctimetuple())
+            self._prune()
+
+    def revoke_account(self, sub: str, keep=None):
+        """Revoke every token issued to an account until now.
+
+        :param sub: Hex UUID of the account
+        :param str keep: Hex UUID of an access token to keep valid
+        """
+        with self._lock:
+            self._accounts[sub] = (int(time()), set() if keep is None else {keep})
+
+    def issue(self, claims: dict):
+        """Remember a token issued after its account was revoked.
+
+        Timestamps only have second precision, this tells tokens issued in the second of a revocation apart.
+        """
+        with self._lock:
+            if claims["sub"] in self._accounts:
+                revoked_at, kept = self._accounts[claims["sub"]]
+                if claims["iat"] >= revoked_at:
+                    kept.add(claims["yggt"])
+
+    def is_revoked(self, claims: dict) -> bool:
+        with self._lock:
+            if claims["yggt"] in self._tokens:
+                return True
+            if claims["sub"] in self._accounts:
+                revoked_at, kept = self._accounts[claims["sub"]]
+                return claims["iat"] <= revoked_at and claims["yggt"] not in kept
+        return False
+
+    def _prune(self):
+        now = time()
+        if now - self._last_prune < PRUNE_INTERVAL:
+            return
+        self._last_prune = now
+        self._tokens = {yggt: exp for yggt, exp in self._tokens.items() if exp >= now}
+
+
+revocations = RevocationSet()
+
+
+def encode_access_token(access_token) -> str:
+    """Sign AccessToken to respond to the client.
+
+    :param db.AccessToken access_token: AccessToken to sign
+    :return: JWT encoded token
+    """
+    claims = access_token.format()
+    revocations.issue(claims)
+    return jwt_encode(claims, key=_get_token_key(), algorithm=ALGORITHM).decode()
+
+
+def verify_access_token(token) -> dict:
+    """Check an access token without the database.
+
+    Returns None when the token can't be judged locally, either because it isn't signed with our key
+    (a bare UUID or a token from an older version) or because it predates the revocation set.
+    Such tokens must be looked up with AccessToken.from_token().
+
+    :param str token: Token string sent by the client
+    :raise InvalidTokenException: If the token is signed by us but expired or revoked.
+    :return: Claims of the token
+    :rtype: dict or None
+    """
+    if not isinstance(token, str):
+        return None
+
+    try:
+        claims = jwt_decode(jwt=token, key=_get_token_key(), algorithms=[ALGORITHM])
+    except jwt_exceptions.ExpiredSignatureError:
+        raise InvalidTokenException("Access token expired.")
+    except jwt_exceptions.InvalidTokenError:
+        return None
+
+    if any(claim not in claims for claim in ("sub", "yggt", "iat")) or claims["iat"] <= revocations.trusted_since:
+        return None
+
+    if revocations.is_revoked(claims):
+        raise InvalidTokenException("Access token revoked.")
+
+    return claims
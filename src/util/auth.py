@@ -1,21 +1,7 @@
-from passlib.context import CryptContext
 from jwt import decode as jwt_decode
 
 from db import Account
-
-password_crypto_context = CryptContext(
-    schemes=["pbkdf2_sha256"],
-    default="pbkdf2_sha256",
-    pbkdf2_sha256__default_rounds=30000,
-)
-
-
-def password_hash(cleartext: str):
-    return password_crypto_context.hash(cleartext)
-
-
-def password_compare(cleartext: str, hashed: str):
-    return password_crypto_context.verify(cleartext, hashed)
+from util.password import password_compare
 
 
 def read_yggt(access_token_string: str):
@@ -36,6 +22,7 @@ def attempt_login(username: str, password: str):
 
     :param username: Account username
     :param password: Cleartext account password
+    :raise PoolBusyException: If the password pool is too busy to verify in time.
     :return: Account if credentials correct, None otherwise.
     :rtype: Account or None
     """
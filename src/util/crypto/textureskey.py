@@ -0,0 +1,42 @@
+from cryptography.hazmat.backends import default_backend
+from cryptography.hazmat.primitives import serialization
+from cryptography.hazmat.primitives.asymmetric import rsa
+
+from paths import TEXTURES_PRIVATE_KEY_PATH, TEXTURES_PUBLIC_KEY_PATH
+
+
+def create_and_write_textures_keys(overwrite=False) -> rsa.RSAPrivateKeyWithSerialization:
+    if not overwrite and TEXTURES_PUBLIC_KEY_PATH.exists() and TEXTURES_PRIVATE_KEY_PATH.exists():
+        return serialization.load_pem_private_key(
+            data=TEXTURES_PRIVATE_KEY_PATH.read_bytes(),
+            password=None,
+            backend=default_backend()
+        )
+
+    textures_key = rsa.generate_private_key(
+        public_exponent=65537,
+        key_size=4096,
+        backend=default_backend()
+    )
+
+    textures_pub = textures_key.public_key()
+
+    with open(TEXTURES_PRIVATE_KEY_PATH, "wb") as textures_key_file:
+        textures_key_file.write(textures_key.private_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PrivateFormat.PKCS8,
+            encryption_algorithm=serialization.NoEncryption()
+        ))
+
+    # Clients verify property signatures with an X.509 SubjectPublicKeyInfo key, like Mojang's.
+    with open(TEXTURES_PUBLIC_KEY_PATH, "wb") as textures_pub_file:
+        textures_pub_file.write(textures_pub.public_bytes(
+            encoding=serialization.Encoding.PEM,
+            format=serialization.PublicFormat.SubjectPublicKeyInfo
+        ))
+
+    return textures_key
+
+
+if __name__ == '__main__':
+    create_and_write_textures_keys(overwrite=True)
@@ -0,0 +1,19 @@
+from secrets import token_bytes
+
+from paths import TOKEN_KEY_PATH
+
+
+def create_and_write_token_key(overwrite=False) -> bytes:
+    if not overwrite and TOKEN_KEY_PATH.exists():
+        return TOKEN_KEY_PATH.read_bytes()
+
+    token_key = token_bytes(64)
+
+    with open(TOKEN_KEY_PATH, "wb") as token_key_file:
+        token_key_file.write(token_key)
+
+    return token_key
+
+
+if __name__ == '__main__':
+    create_and_write_token_key(overwrite=True)
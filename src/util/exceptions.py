@@ -13,3 +13,23 @@ class InvalidAuthHeaderException(AuthorizationException):
 class ExistsException(NepoJangException):
     """A field that was supposed to be unique would not be unique if this operation was completed."""
     pass
+
+
+class PoolBusyException(NepoJangException):
+    """A process pool could not accept or finish a job in time."""
+    pass
+
+
+class InvalidTokenException(AuthorizationException):
+    """An access token was recognized but is expired or revoked."""
+    pass
+
+
+class TextureFetchException(NepoJangException):
+    """A remote texture could not be downloaded within the limits."""
+    pass
+
+
+class InvalidImageException(NepoJangException):
+    """An uploaded texture could not be decoded as an image."""
+    pass
@@ -0,0 +1,85 @@
+from contextlib import contextmanager
+from threading import Event, Lock
+
+DEFAULT_MAX_WAITERS = 8  # Each waiter holds a server thread, raise it along with the amount of threads.
+DEFAULT_MAX_WAIT = 5  # seconds
+
+
+class JoinWaiters:
+    """hasJoined requests waiting for the client's join to be recorded.
+
+    Waiting ties up the thread serving the request, so the amount of waiters and their wait are capped.
+    Requests which do not fit are answered right away, as if they did not ask to wait.
+    """
+
+    def __init__(self, max_waiters=DEFAULT_MAX_WAITERS, max_wait=DEFAULT_MAX_WAIT):
+        """
+        :param int max_waiters: Maximum amount of requests waiting at once
+        :param float max_wait: Maximum seconds a request may wait
+        """
+        self.max_waiters = max_waiters
+        self.max_wait = max_wait
+
+        self._waiting = {}  # (profile name_key, server hash) -> [Event, amount of waiters]
+        self._count = 0
+        self._lock = Lock()
+
+    @contextmanager
+    def waiting(self, name_key: str, server_hash: str):
+        """Register interest in a join before checking the session store, so a join in between is not missed.
+
+        :return: Context manager giving an Event set on notify(), or None if no more waiters are allowed
+        """
+        key = (name_key, server_hash)
+        with self._lock:
+            if self._count >= self.max_waiters:
+                entry = None
+            else:
+                entry = self._waiting.setdefault(key, [Event(), 0])
+                entry[1] += 1
+                self._count += 1
+
+        try:
+            yield None if entry is None else entry[0]
+        finally:
+            if entry is not None:
+                with self._lock:
+                    self._count -= 1
+                    entry[1] -= 1
+                    if entry[1] == 0 and self._waiting.get(key) is entry:
+                        del self._waiting[key]
+
+    def notify(self, name_key: str, server_hash: str):
+        """Wake requests waiting for a join. Call after the session is visible in the session store."""
+        with self._lock:
+            entry = self._waiting.pop((name_key, server_hash), None)
+        if entry is not None:
+            entry[0].set()
+
+
+join_waiters = JoinWaiters()
+
+
+def configure(max_waiters=DEFAULT_MAX_WAITERS, max_wait=DEFAULT_MAX_WAIT):
+    """Replace the join waiters.
+
+    :param int max_waiters: Maximum amount of hasJoined requests waiting at once, 0 to disable waiting
+    :param float max_wait: Maximum seconds a hasJoined request may wait
+    """
+    global join_waiters
+    join_waiters = JoinWaiters(max_waiters=max_waiters, max_wait=max_wait)
+
+
+@contextmanager
+def waiting_for_join(name_key: str, server_hash: str):
+    with join_waiters.waiting(name_key, server_hash) as event:
+        yield event
+
+
+def wait_timeout(requested: float) -> float:
+    """Clamp requested seconds of waiting to the allowed maximum."""
+    return max(0.0, min(requested, join_waiters.max_wait))
+
+
+def notify_join(name_key: str, server_hash: str):
+    join_waiters.notify(name_key, server_hash)
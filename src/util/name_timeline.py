@@ -0,0 +1,209 @@
+from bisect import bisect_left, bisect_right
+from threading import Event, Lock, Thread
+from time import monotonic
+
+from pony.orm import db_session, select, max
+
+from db import Profile, ProfileNameEvent, ProfileChange, NAME_LOOKUP_CHUNK_SIZE
+
+DEFAULT_REFRESH_INTERVAL = 5  # seconds
+CHANGE_BATCH_SIZE = 5000
+
+
+class _Interval:
+    __slots__ = ("name_key", "active_from", "profile_id", "superseded_at")
+
+    def __init__(self, name_key, active_from, profile_id):
+        self.name_key = name_key
+        self.active_from = active_from
+        self.profile_id = profile_id
+        self.superseded_at = None  # active_from of the next ProfileNameEvent of the same profile
+
+
+class NameTimeline:
+    """In memory index of which profile owned which name when.
+
+    Mirrors ProfileNameEvents, answering Profile.that_owned_name_at() with a binary search.
+    Stays disabled, answering nothing, until build() is called.
+    Profiles are created, renamed and edited by scripts in other processes. A background thread started by
+    load_name_timeline() reads the committed ProfileChange rows after the last one it applied, and reloads
+    just the profiles they name, so the index lags up to a refresh interval behind the database.
+    """
+
+    def __init__(self):
+        self.enabled = False
+        self.last_change_id = 0  # Id of the last ProfileChange the contents include
+        self.refreshed_at = None  # monotonic() of the last successful refresh
+        self.max_age = None  # Seconds after the last successful refresh the contents are still trusted
+
+        self._starts = {}  # name_key -> sorted list of active_from
+        self._intervals = {}  # name_key -> list of _Interval in the same order as _starts
+        self._profile_intervals = {}  # profile id -> list of _Interval sorted by active_from
+        self._profiles = {}  # profile id -> (uuid hex, current name)
+        self._lock = Lock()
+
+    def build(self, profiles, events, last_change_id: int):
+        """Replace the index contents and enable it.
+
+        :param profiles: Iterable of (profile id, profile UUID, current name)
+        :param events: Iterable of (profile id, name_key, active_from)
+        :param last_change_id: Id of the last ProfileChange committed before the rows were read
+        """
+        timeline = NameTimeline()
+        for profile_id, uuid, name in profiles:
+            timeline._profiles[profile_id] = (uuid.hex, name)
+        for profile_id, name_key, active_from in sorted(events, key=lambda event: event[2]):
+            timeline._add_event(profile_id, name_key, active_from)
+
+        with self._lock:
+            self._starts, self._intervals = timeline._starts, timeline._intervals
+            self._profile_intervals, self._profiles = timeline._profile_intervals, timeline._profiles
+            self.last_change_id = last_change_id
+            self.refreshed_at = monotonic()
+            self.enabled = True
+
+    def update_profiles(self, profile_ids, profiles, events, last_change_id: int):
+        """Replace what the index knows about some profiles.
+
+        :param profile_ids: Ids of the changed profiles, those missing from profiles were deleted
+        :param profiles: Iterable of (profile id, profile UUID, current name) of the changed profiles
+        :param events: Iterable of (profile id, name_key, active_from) of the changed profiles
+        :param last_change_id: Id of the last ProfileChange applied
+        """
+        with self._lock:
+            for profile_id in profile_ids:
+                self._remove_profile(profile_id)
+            for profile_id, uuid, name in profiles:
+                self._profiles[profile_id] = (uuid.hex, name)
+            for profile_id, name_key, active_from in sorted(events, key=lambda event: event[2]):
+                self._add_event(profile_id, name_key, active_from)
+            self.last_change_id = last_change_id
+            self.refreshed_at = monotonic()
+
+    def mark_refreshed(self):
+        with self._lock:
+            self.refreshed_at = monotonic()
+
+    def is_current(self) -> bool:
+        """Whether the last refresh succeeded recently enough to answer lookups, misses included."""
+        return self.enabled and self.refreshed_at is not None and self.max_age is not None \
+            and monotonic() - self.refreshed_at <= self.max_age
+
+    def _remove_profile(self, profile_id):
+        self._profiles.pop(profile_id, None)
+        for interval in self._profile_intervals.pop(profile_id, []):
+            intervals = self._intervals[interval.name_key]
+            index = next(index for index, other in enumerate(intervals) if other is interval)
+            del intervals[index]
+            del self._starts[interval.name_key][index]
+            if not intervals:
+                del self._intervals[interval.name_key]
+                del self._starts[interval.name_key]
+
+    def _add_event(self, profile_id, name_key, active_from):
+        interval = _Interval(name_key, active_from, profile_id)
+
+        starts = self._starts.setdefault(name_key, [])
+        index = bisect_right(starts, active_from)
+        starts.insert(index, active_from)
+        self._intervals.setdefault(name_key, []).insert(index, interval)
+
+        profile_intervals = self._profile_intervals.setdefault(profile_id, [])
+        index = bisect_right([other.active_from for other in profile_intervals], active_from)
+        profile_intervals.insert(index, interval)
+        if index > 0:
+            profile_intervals[index - 1].superseded_at = active_from
+        if index + 1 < len(profile_intervals):
+            interval.superseded_at = profile_intervals[index + 1].active_from
+
+    def owner_at(self, name_key: str, datetime_object):
+        """Find profile that owned the name at time.
+
+        :param name_key: normalize_name() of the profile name
+        :param datetime_object: Time to look up the owner
+        :return: (profile UUID hex, current profile name) or None
+        :rtype: tuple or None
+        """
+        with self._lock:
+            starts = self._starts.get(name_key)
+            if starts is None:
+                return None
+
+            index = bisect_left(starts, datetime_object) - 1
+            if index < 0:
+                return None
+
+            interval = self._intervals[name_key][index]
+            if interval.superseded_at is not None and interval.superseded_at < datetime_object:
+                return None
+
+            return self._profiles.get(interval.profile_id)
+
+
+name_timeline = NameTimeline()
+
+
+def _chunks(items):
+    items = list(items)
+    for start in range(0, len(items), NAME_LOOKUP_CHUNK_SIZE):
+        yield items[start:start + NAME_LOOKUP_CHUNK_SIZE]
+
+
+@db_session
+def _rebuild():
+    # Read the watermark first, changes committed while reading the rest are applied again by the next refresh.
+    last_change_id = max(c.id for c in ProfileChange) or 0
+    name_timeline.build(
+        select((p.id, p.uuid, p.name) for p in Profile)[:],
+        select((e.profile.id, e.name_key, e.active_from) for e in ProfileNameEvent)[:],
+        last_change_id,
+    )
+
+
+@db_session
+def _apply_changes() -> bool:
+    """Apply a batch of ProfileChanges.
+
+    :return: Whether there may be more to apply
+    """
+    last_change_id = name_timeline.last_change_id
+    changes = select((c.id, c.profile_id) for c in ProfileChange if c.id > last_change_id) \
+        .order_by(1)[:CHANGE_BATCH_SIZE]
+    if not changes:
+        name_timeline.mark_refreshed()
+        return False
+
+    if changes[0][0] != last_change_id + 1:  # Pruned by the sweeper before this process saw them
+        _rebuild()
+        return False
+
+    profile_ids = {profile_id for _, profile_id in changes}
+    profiles, events = [], []
+    for chunk in _chunks(profile_ids):
+        profiles += select((p.id, p.uuid, p.name) for p in Profile if p.id in chunk)[:]
+        events += select((e.profile.id, e.name_key, e.active_from) for e in ProfileNameEvent
+                         if e.profile.id in chunk)[:]
+    name_timeline.update_profiles(profile_ids, profiles, events, changes[-1][0])
+    return len(changes) == CHANGE_BATCH_SIZE
+
+
+def load_name_timeline(refresh_interval=DEFAULT_REFRESH_INTERVAL) -> Event:
+    """Build name_timeline from the database and keep it up to date in a daemon thread.
+
+    :param float refresh_interval: Seconds between checks for ProfileChanges
+    :return: Event which stops the updates when set
+    """
+    name_timeline.max_age = 3 * refresh_interval  # A couple of failed refreshes before falling back to the database
+    _rebuild()
+    stop = Event()
+
+    def loop():
+        while not stop.wait(refresh_interval):
+            try:
+                while _apply_changes():
+                    pass
+            except Exception as e:  # e.g. "database is locked" under load, the next check may succeed
+                print(f"Updating the name timeline failed: {e!r}")
+
+    Thread(target=loop, name="name timeline", daemon=True).start()
+    return stop
@@ -0,0 +1,48 @@
+from passlib.context import CryptContext
+
+from util.process_pool import BoundedProcessPool
+
+password_crypto_context = CryptContext(
+    schemes=["pbkdf2_sha256"],
+    default="pbkdf2_sha256",
+    pbkdf2_sha256__default_rounds=30000,
+)
+
+password_pool = BoundedProcessPool()
+
+
+def configure(max_workers=None, max_queued=64, timeout=10.0):
+    """Replace the password hashing pool.
+
+    :param int or None max_workers: Amount of worker processes, defaults to the amount of CPUs
+    :param int max_queued: Maximum amount of hashing jobs waiting for or running in a worker
+    :param float timeout: Seconds to wait for a free slot and again for the result
+    """
+    global password_pool
+    password_pool.shutdown()
+    password_pool = BoundedProcessPool(max_workers=max_workers, max_queued=max_queued, timeout=timeout)
+    password_pool.start()
+
+
+def _hash(cleartext: str) -> str:
+    return password_crypto_context.hash(cleartext)
+
+
+def _verify(cleartext: str, hashed: str) -> bool:
+    return password_crypto_context.verify(cleartext, hashed)
+
+
+def password_hash(cleartext: str) -> str:
+    """Hash password in the password pool.
+
+    :raise PoolBusyException: If the pool is too busy to hash in time.
+    """
+    return password_pool.run(_hash, cleartext)
+
+
+def password_compare(cleartext: str, hashed: str) -> bool:
+    """Verify password in the password pool.
+
+    :raise PoolBusyException: If the pool is too busy to verify in time.
+    """
+    return password_pool.run(_verify, cleartext, hashed)
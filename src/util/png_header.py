@@ -0,0 +1,70 @@
+from struct import Struct
+from zlib import crc32
+
+from util.exceptions import InvalidImageException
+
+SKIN_SIZES = {(64, 32), (64, 64)}
+CAPE_SIZES = {(64, 32)}
+
+PNG_SIGNATURE = b"\x89PNG\r\n\x1a\n"
+IHDR = Struct(">I4sIIBBBBBI")  # length, type, width, height, bit depth, color type, compression, filter, interlace, CRC
+HEADER_LENGTH = len(PNG_SIGNATURE) + IHDR.size  # 33
+
+# Color type -> allowed bit depths
+BIT_DEPTHS = {
+    0: {1, 2, 4, 8, 16},  # Grayscale
+    2: {8, 16},  # RGB
+    3: {1, 2, 4, 8},  # Palette
+    4: {8, 16},  # Grayscale and alpha
+    6: {8, 16},  # RGBA
+}
+
+
+def read_png_size(head: bytes):
+    """Read the size of a PNG from its signature and IHDR chunk, without decoding anything.
+
+    :param head: At least the first 33 bytes of the file
+    :return: (width, height), or None if it does not start with a valid PNG header
+    :rtype: tuple or None
+    """
+    if len(head) < HEADER_LENGTH or head[:len(PNG_SIGNATURE)] != PNG_SIGNATURE:
+        return None
+
+    length, chunk_type, width, height, bit_depth, color_type, compression, filter_method, interlace, crc = \
+        IHDR.unpack_from(head, len(PNG_SIGNATURE))
+    if length != 13 or chunk_type != b"IHDR" or crc != crc32(head[len(PNG_SIGNATURE) + 4:HEADER_LENGTH - 4]):
+        return None
+    if width == 0 or height == 0 or bit_depth not in BIT_DEPTHS.get(color_type, ()) \
+            or compression != 0 or filter_method != 0 or interlace not in (0, 1):
+        return None
+    return width, height
+
+
+def check_png_header(head: bytes, sizes):
+    """Reject a texture from its header alone, before Pillow gets to decode it.
+
+    :param head: At least the first 33 bytes of the file
+    :param sizes: Set of allowed (width, height)
+    :raise InvalidImageException: If it does not start with a valid PNG header
+    :raise ValueError: If it has a size not in sizes
+    :return: (width, height)
+    """
+    size = read_png_size(head)
+    if size is None:
+        raise InvalidImageException("Image must be in PNG format.")
+    if size not in sizes:
+        raise ValueError(f"Image size must be one of {sorted(sizes)}. It is {size}")
+    return size
+
+
+def check_png_stream(readable, sizes):
+    """Check the header of a seekable binary file object, leaving its position unchanged.
+
+    :raise InvalidImageException: If it does not start with a valid PNG header
+    :raise ValueError: If it has a size not in sizes
+    :return: (width, height)
+    """
+    position = readable.tell()
+    head = readable.read(HEADER_LENGTH)
+    readable.seek(position)
+    return check_png_header(head, sizes)
@@ -0,0 +1,84 @@
+from concurrent.futures import ProcessPoolExecutor, TimeoutError as FutureTimeoutError
+from concurrent.futures.process import BrokenProcessPool
+from threading import BoundedSemaphore, Lock
+
+from util.exceptions import PoolBusyException
+
+
+class BoundedProcessPool:
+    """Process pool with a limited amount of queued jobs.
+
+    The executor is created by start(), or on first use, so importing this module does not spawn processes.
+    A worker dying, for example killed for running out of memory, breaks the executor. It is then replaced
+    by a new one on the next job.
+    Functions given to run() must be picklable, meaning they have to be defined at module level.
+    """
+
+    def __init__(self, max_workers=None, max_queued=64, timeout=10.0):
+        """
+        :param int or None max_workers: Amount of worker processes, defaults to the amount of CPUs
+        :param int max_queued: Maximum amount of jobs waiting for or running in a worker
+        :param float timeout: Seconds to wait for a free slot and again for the result
+        """
+        self.max_workers = max_workers
+        self.max_queued = max_queued
+        self.timeout = timeout
+
+        self._slots = BoundedSemaphore(max_queued)
+        self._executor = None
+        self._executor_lock = Lock()
+
+    def start(self):
+        """Create the executor now, call before starting threads so the workers are not forked from one."""
+        self._get_executor()
+
+    def _get_executor(self) -> ProcessPoolExecutor:
+        with self._executor_lock:
+            if self._executor is None:
+                self._executor = ProcessPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def _discard_executor(self, executor: ProcessPoolExecutor):
+        with self._executor_lock:
+            if self._executor is executor:  # Another thread may have replaced it already.
+                self._executor = None
+        executor.shutdown(wait=False)
+
+    def run(self, function, *args):
+        """Run function in a worker process and wait for its result.
+
+        :raise PoolBusyException:
+            If the queue stayed full for timeout seconds.
+            If the result did not arrive in timeout seconds.
+            If a worker died, the next job gets a new executor.
+        :return: Return value of function
+        """
+        if not self._slots.acquire(timeout=self.timeout):
+            raise PoolBusyException(f"No free slot in the process pool after {self.timeout} seconds.")
+
+        executor = self._get_executor()
+        try:
+            future = executor.submit(function, *args)
+        except BrokenProcessPool:
+            self._slots.release()
+            self._discard_executor(executor)
+            raise PoolBusyException("A process pool worker died, the pool is being restarted.")
+        except BaseException:
+            self._slots.release()
+            raise
+        future.add_done_callback(lambda _: self._slots.release())
+
+        try:
+            return future.result(timeout=self.timeout)
+        except FutureTimeoutError:
+            future.cancel()
+            raise PoolBusyException(f"Process pool did not return a result in {self.timeout} seconds.")
+        except BrokenProcessPool:
+            self._discard_executor(executor)
+            raise PoolBusyException("A process pool worker died, the pool is being restarted.")
+
+    def shutdown(self):
+        with self._executor_lock:
+            if self._executor is not None:
+                self._executor.shutdown(wait=True)
+                self._executor = None
@@ -1,23 +1,22 @@
-from base64 import b64encode
-from json import dumps
-
 from db import Profile
+from util.textures_property import get_textures_value
+from util.textures_signature import sign_property_value
 
 
-def get_public_profile_details(profile: Profile, unsigned: bool, textures_host: str) -> dict:
+def get_public_profile_details(profile: Profile, unsigned: bool, textures_host: str, skin_and_cape=None) -> dict:
     data = {
         "id": profile.uuid.hex,
         "name": profile.name,
         "properties": [
             {
                 "name": "textures",  # Who puts a "name" field in a list member? Just make a dict!
-                "value": b64encode(dumps(profile.get_texture_data(textures_host)).encode("utf-8")).decode("utf-8"),
-                # "signature": ""  # todo?
+                "value": get_textures_value(profile, textures_host, skin_and_cape),
             }
         ]
     }
 
     if not unsigned:
-        pass  # todo?
+        for prop in data["properties"]:
+            prop["signature"] = sign_property_value(prop["value"])
 
     return data
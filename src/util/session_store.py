@@ -0,0 +1,125 @@
+from threading import Lock
+from time import monotonic
+
+from db import MCServerSession
+
+DEFAULT_TTL = 30  # seconds
+PURGE_INTERVAL = 60  # seconds
+
+
+class DatabaseSessionStore:
+    """Keep join sessions as MCServerSession rows.
+
+    Durable and shared between processes, but every join and hasJoined is a write transaction.
+    Must be used inside db_session.
+    """
+
+    def put(self, profile, client_side_ip: str, server_hash: str):
+        session = MCServerSession.get(lambda x:
+                                      x.profile == profile
+                                      and x.client_side_ip == client_side_ip
+                                      and x.server_hash == server_hash)
+
+        if session is None:
+            MCServerSession.select(lambda x: x.profile == profile).delete()
+            MCServerSession(
+                profile=profile,
+                client_side_ip=client_side_ip,
+                server_hash=server_hash,
+            )
+
+    def get(self, profile, server_hash: str):
+        session = MCServerSession.get(lambda x:
+                                      x.profile == profile
+                                      and x.server_hash == server_hash)
+        return None if session is None else session.client_side_ip
+
+    def discard(self, profile, server_hash: str):
+        MCServerSession.select(lambda x: x.profile == profile and x.server_hash == server_hash).delete()
+
+
+class MemorySessionStore:
+    """Keep join sessions in a dict, forgetting them after ttl seconds.
+
+    A profile has at most one session, joining another server replaces it like DatabaseSessionStore does,
+    so the dict is keyed by profile and the server hash is compared on lookup.
+    Sessions are lost on restart and are not shared between processes.
+    """
+
+    def __init__(self, ttl=DEFAULT_TTL):
+        self.ttl = ttl
+
+        self._sessions = {}  # profile id -> (server hash, client side ip, expires at)
+        self._lock = Lock()
+        self._last_purge = monotonic()
+
+    def put(self, profile, client_side_ip: str, server_hash: str):
+        now = monotonic()
+        with self._lock:
+            self._sessions[profile.id] = (server_hash, client_side_ip, now + self.ttl)
+            if now - self._last_purge > PURGE_INTERVAL:
+                self._purge(now)
+
+    def get(self, profile, server_hash: str):
+        with self._lock:
+            session = self._sessions.get(profile.id)
+            if session is None:
+                return None
+
+            session_server_hash, client_side_ip, expires_at = session
+            if expires_at < monotonic():
+                del self._sessions[profile.id]
+                return None
+
+            return client_side_ip if session_server_hash == server_hash else None
+
+    def discard(self, profile, server_hash: str):
+        with self._lock:
+            session = self._sessions.get(profile.id)
+            if session is not None and session[0] == server_hash:
+                del self._sessions[profile.id]
+
+    def _purge(self, now):
+        self._last_purge = now
+        self._sessions = {key: session for key, session in self._sessions.items() if session[2] >= now}
+
+
+session_store = MemorySessionStore()
+
+
+def configure(backend="memory", ttl=DEFAULT_TTL):
+    """Replace the join session store.
+
+    :param str backend: "memory" or "database"
+    :param float ttl: Seconds a session is kept by the memory backend
+    """
+    global session_store
+    if backend == "database":
+        session_store = DatabaseSessionStore()
+    else:
+        session_store = MemorySessionStore(ttl)
+
+
+def put_session(profile, client_side_ip: str, server_hash: str):
+    """Record that a client joined a server, replacing the profile's previous session.
+
+    :param db.Profile profile: Profile which joined
+    :param client_side_ip: IP address of the client
+    :param server_hash: serverId sent by the client
+    """
+    session_store.put(profile, client_side_ip, server_hash)
+
+
+def get_session(profile, server_hash: str):
+    """Find the session of a profile on a server.
+
+    :param db.Profile profile: Profile which joined
+    :param server_hash: serverId sent by the server
+    :return: IP address of the client
+    :rtype: str or None
+    """
+    return session_store.get(profile, server_hash)
+
+
+def discard_session(profile, server_hash: str):
+    session_store.discard(profile, server_hash)
@@ -0,0 +1,106 @@
+from datetime import datetime, timedelta
+from threading import Event, Thread
+from time import monotonic
+
+from pony.orm import db_session, select, max
+
+from db import AccessToken, ClientToken, TrustedIP, MCServerSession, ProfileChange
+
+MCSERVER_SESSION_LIFETIME = timedelta(minutes=1)
+PROFILE_CHANGES_KEPT = 10000  # Name timelines further behind than this rebuild from scratch
+
+
+def _expired_access_token_ids(now: datetime, limit: int) -> list:
+    # An AccessToken is useless once its ClientToken expired, even if it didn't expire itself.
+    return select(t.id for t in AccessToken if t.expiry_utc < now or t.client_token.expiry_utc < now)[:limit]
+
+
+def _expired_client_token_ids(now: datetime, limit: int) -> list:
+    return select(t.id for t in ClientToken if t.expiry_utc < now and not t.access_tokens)[:limit]
+
+
+def _expired_trusted_ip_ids(now: datetime, limit: int) -> list:
+    return select(t.id for t in TrustedIP if t.expiry_utc < now)[:limit]
+
+
+def _expired_mcserver_session_ids(now: datetime, limit: int) -> list:
+    created_before = now - MCSERVER_SESSION_LIFETIME
+    return select(s.id for s in MCServerSession if s.created_utc < created_before)[:limit]
+
+
+def _old_profile_change_ids(_, limit: int) -> list:
+    last_id = max(c.id for c in ProfileChange)
+    if last_id is None:
+        return []
+    return select(c.id for c in ProfileChange if c.id <= last_id - PROFILE_CHANGES_KEPT)[:limit]
+
+
+SWEEPS = [  # AccessTokens must go before the ClientTokens they reference.
+    (AccessToken, _expired_access_token_ids),
+    (ClientToken, _expired_client_token_ids),
+    (TrustedIP, _expired_trusted_ip_ids),
+    (MCServerSession, _expired_mcserver_session_ids),
+    (ProfileChange, _old_profile_change_ids),
+]
+
+
+def _sweep_entity(entity, find_ids, now: datetime, batch_size: int) -> int:
+    deleted = 0
+    while True:
+        with db_session:  # Every batch is its own transaction so the writer lock is released in between.
+            ids = find_ids(now, batch_size)
+            if len(ids) == 0:
+                break
+            entity.select(lambda x: x.id in ids).delete(bulk=True)
+        deleted += len(ids)
+        if len(ids) < batch_size:
+            break
+    return deleted
+
+
+def sweep_expired(batch_size=500, now=None) -> dict:
+    """Delete expired AccessTokens, ClientTokens, TrustedIPs and MCServerSessions, and old ProfileChanges.
+
+    Rows are deleted in batches of batch_size, each batch in a separate transaction.
+    ClientTokens which still have AccessTokens are kept.
+
+    :param int batch_size: Maximum rows deleted in a single transaction
+    :param datetime now: Naive UTC datetime to compare expiry dates with, defaults to now
+    :return: {entity name: (deleted row count, seconds taken)}
+    """
+    if now is None:
+        now = datetime.utcnow()
+
+    report = {}
+    for entity, find_ids in SWEEPS:
+        started = monotonic()
+        deleted = _sweep_entity(entity, find_ids, now, batch_size)
+        report[entity.__name__] = (deleted, monotonic() - started)
+    return report
+
+
+def format_report(report: dict) -> str:
+    return ", ".join(f"{name}: {deleted} in {seconds:.3f}s" for name, (deleted, seconds) in report.items())
+
+
+def start_sweeper(interval: float, batch_size=500) -> Event:
+    """Run sweep_expired() every interval seconds in a daemon thread.
+
+    :param float interval: Seconds between sweeps
+    :param int batch_size: Maximum rows deleted in a single transaction
+    :return: Event which stops the sweeper when set
+    """
+    stop = Event()
+
+    def loop():
+        while not stop.wait(interval):
+            try:
+                report = sweep_expired(batch_size)
+            except Exception as e:  # e.g. "database is locked" under load, the next sweep may succeed
+                print(f"Sweeping expired rows failed: {e!r}")
+                continue
+            if any(deleted for deleted, _ in report.values()):
+                print(f"Swept expired rows: {format_report(report)}")
+
+    Thread(target=loop, name="sweeper", daemon=True).start()
+    return stop
@@ -0,0 +1,126 @@
+from socket import fromfd, AF_INET, SOCK_STREAM, SHUT_RDWR
+from threading import Timer
+from time import monotonic
+
+from requests import get, RequestException
+from urllib3.exceptions import ProtocolError
+
+from util.cache import LRUCache
+from util.exceptions import TextureFetchException
+from util.png_header import HEADER_LENGTH, check_png_header
+
+CHUNK_SIZE = 4096
+
+
+def _abort(response):
+    """Unblock a read of a streamed response from another thread by shutting its connection down."""
+    try:
+        sock = fromfd(response.raw.fileno(), AF_INET, SOCK_STREAM)  # A duplicate, closing it leaves the original.
+    except (OSError, ValueError):
+        return
+    with sock:
+        try:
+            sock.shutdown(SHUT_RDWR)
+        except OSError:
+            pass
+
+
+class TextureFetcher:
+    """Downloads remote textures without letting a slow or huge response hold the request.
+
+    Responses are streamed, abandoned once they exceed max_bytes or take longer than deadline seconds,
+    and rejected as soon as the PNG header shows the wrong size. Accepted downloads are cached by URL.
+    """
+
+    def __init__(self, max_bytes=64 * 1024, connect_timeout=3.0, read_timeout=5.0, deadline=10.0,
+                 cache_size=256, cache_ttl=300):
+        """
+        :param int max_bytes: Maximum size of a texture file
+        :param float connect_timeout: Seconds to wait for the connection
+        :param float read_timeout: Seconds to wait between received bytes
+        :param float deadline: Seconds the whole download may take
+        :param int cache_size: Maximum amount of cached downloads
+        :param float cache_ttl: Seconds a download stays cached
+        """
+        self.max_bytes = max_bytes
+        self.connect_timeout = connect_timeout
+        self.read_timeout = read_timeout
+        self.deadline = deadline
+
+        self._cache = LRUCache(max_size=cache_size, ttl=cache_ttl)
+
+    def fetch(self, url: str, sizes) -> bytes:
+        """Download a PNG texture.
+
+        :param url: HTTP(S) URL of the texture
+        :param sizes: Set of allowed (width, height)
+        :raise TextureFetchException: If the download failed, took too long or was too big
+        :raise InvalidImageException: If it is not a PNG
+        :raise ValueError: If it has a size not in sizes
+        :return: Contents of the file
+        """
+        data = self._cache.get(url)
+        if data is not None:
+            check_png_header(data, sizes)
+            return data
+
+        started_at = monotonic()
+        try:
+            with get(url, stream=True, timeout=(self.connect_timeout, self.read_timeout)) as response:
+                if response.status_code != 200:
+                    raise TextureFetchException(f"Texture URL answered {response.status_code}")
+
+                content_length = response.headers.get("Content-Length")
+                if content_length is not None and content_length.isdigit() and int(content_length) > self.max_bytes:
+                    raise TextureFetchException(f"Texture is larger than {self.max_bytes} bytes")
+
+                # read_timeout only bounds the wait for each packet, a server dripping bytes would outlast it.
+                watchdog = Timer(self.deadline, _abort, [response])
+                watchdog.start()
+                try:
+                    data = self._read(response, sizes)
+                finally:
+                    watchdog.cancel()
+        except (RequestException, ProtocolError, OSError) as e:
+            raise TextureFetchException(f"Texture could not be downloaded: {e}") from e
+
+        if monotonic() - started_at >= self.deadline:  # The watchdog may have cut it short without an error.
+            raise TextureFetchException(f"Texture took longer than {self.deadline} seconds")
+
+        data = bytes(data)
+        check_png_header(data, sizes)
+        self._cache.put(url, data)
+        return data
+
+    def _read(self, response, sizes) -> bytearray:
+        data = bytearray()
+        read_size = HEADER_LENGTH  # Reject the wrong size before the body finishes.
+        while True:
+            chunk = response.raw.read(read_size, decode_content=True)
+            if not chunk:
+                return data
+
+            data += chunk
+            if len(data) > self.max_bytes:
+                raise TextureFetchException(f"Texture is larger than {self.max_bytes} bytes")
+
+            if read_size == HEADER_LENGTH and len(data) >= HEADER_LENGTH:
+                check_png_header(data, sizes)
+                read_size = CHUNK_SIZE
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+texture_fetcher = TextureFetcher()
+
+
+def configure(**kwargs):
+    """Replace the texture fetcher. Takes the keyword arguments of TextureFetcher."""
+    global texture_fetcher
+    texture_fetcher = TextureFetcher(**kwargs)
+
+
+def fetch_texture(url: str, sizes) -> bytes:
+    """Download a PNG texture, see TextureFetcher.fetch()."""
+    return texture_fetcher.fetch(url, sizes)
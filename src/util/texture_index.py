@@ -0,0 +1,77 @@
+from threading import Lock
+
+from pony.orm import db_session, select
+
+from db import ProfileSkin, ProfileCape
+from util.texture_storage import KIND_ROOTS, stat_texture
+
+
+class TextureIndex:
+    """In memory index of stored textures by name.
+
+    Texture names are content addresses, so an entry stays valid until its texture is deleted.
+    Textures are written and deleted by the other server and the scripts, never by the process serving them.
+    Ones stored after the index was built are looked up in the texture storage on their first request,
+    and deleted ones are dropped when reading them fails.
+    """
+
+    def __init__(self):
+        self._entries = {}  # name -> TextureEntry
+        self._lock = Lock()
+
+    def build(self, textures):
+        """Replace the index contents.
+
+        :param textures: Iterable of (kind, name), kind being a key of KIND_ROOTS
+        """
+        entries = {}
+        for kind, name in textures:
+            entry = stat_texture(kind, name)
+            if entry is not None:
+                entries[name] = entry
+        with self._lock:
+            self._entries = entries
+
+    def add(self, kind: str, name: str):
+        """Index a texture which was just stored.
+
+        :rtype: util.texture_storage.TextureEntry or None
+        """
+        entry = stat_texture(kind, name)
+        if entry is not None:
+            with self._lock:
+                self._entries[name] = entry
+        return entry
+
+    def remove(self, name: str):
+        with self._lock:
+            self._entries.pop(name, None)
+
+    def resolve(self, name: str):
+        """Find a texture.
+
+        :param name: Name of the texture
+        :rtype: util.texture_storage.TextureEntry or None
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+        if entry is not None:
+            return entry
+
+        for kind in KIND_ROOTS:
+            entry = self.add(kind, name)
+            if entry is not None:
+                return entry
+        return None
+
+
+texture_index = TextureIndex()
+
+
+def load_texture_index():
+    """Build texture_index from the database."""
+    with db_session:
+        texture_index.build(
+            [("skin", name) for name in select(x.name for x in ProfileSkin)] +
+            [("cape", name) for name in select(x.name for x in ProfileCape)]
+        )
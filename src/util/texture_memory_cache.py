@@ -0,0 +1,183 @@
+from collections import OrderedDict, namedtuple
+from threading import Lock
+from time import monotonic
+
+from werkzeug.http import quote_etag, http_date
+
+from util.cache import LRUCache
+from util.texture_storage import stat_texture
+
+# Texture names are content addresses, the contents behind a name never change.
+MAX_AGE = 31536000  # 1 year
+CACHE_CONTROL = f"public, max-age={MAX_AGE}, immutable"
+
+CachedTexture = namedtuple("CachedTexture", [
+    "kind",
+    "body",  # PNG file contents
+    "last_modified",  # datetime
+    "headers",  # [(name, value)] of a 200 response
+    "not_modified_headers",  # [(name, value)] of a 304 response
+])
+
+
+def cache_headers(name: str, last_modified) -> list:
+    """Headers every texture response carries, whether served from memory or not."""
+    return [
+        ("ETag", quote_etag(name)),
+        ("Last-Modified", http_date(last_modified)),
+        ("Cache-Control", CACHE_CONTROL),
+    ]
+
+
+class TextureMemoryCache:
+    """Bodies and response headers of frequently requested textures.
+
+    A texture is only admitted once it was requested admit_after times among the recently requested names,
+    so a scan over many textures cannot push out the popular ones. Entries are evicted least recently used first
+    to stay under max_bytes. Deleting a texture does not reach the texture server, so an entry is checked
+    to still be stored every revalidate_interval seconds.
+    """
+
+    def __init__(self, max_bytes=16 * 1024 * 1024, max_entry_bytes=64 * 1024, admit_after=2,
+                 frequency_size=16384, revalidate_interval=60):
+        """
+        :param int max_bytes: Maximum total size of cached bodies, 0 to disable
+        :param int max_entry_bytes: Maximum size of a single cached body
+        :param int admit_after: Requests for a texture before it is cached
+        :param int frequency_size: Maximum amount of names whose requests are counted
+        :param float revalidate_interval: Seconds before a cached texture is checked to still exist
+        """
+        self.max_bytes = max_bytes
+        self.max_entry_bytes = max_entry_bytes
+        self.admit_after = admit_after
+        self.revalidate_interval = revalidate_interval
+
+        self.hits = 0
+        self.misses = 0
+        self.bytes_saved = 0  # Body bytes served from memory, 304s not included
+        self.size = 0  # Total bytes of cached bodies
+
+        self._entries = OrderedDict()  # name -> (checked at, CachedTexture)
+        self._frequencies = LRUCache(max_size=frequency_size)  # name -> requests while not cached
+        self._lock = Lock()
+
+    def get(self, name: str):
+        """Get a cached texture, counting the request towards admitting it on a miss.
+
+        :rtype: CachedTexture or None
+        """
+        with self._lock:
+            entry = self._entries.get(name)
+            if entry is not None:
+                self._entries.move_to_end(name)
+
+        if entry is not None and monotonic() - entry[0] > self.revalidate_interval:
+            if stat_texture(entry[1].kind, name) is None:
+                self.pop(name)
+                entry = None
+            else:
+                with self._lock:
+                    if name in self._entries:
+                        self._entries[name] = (monotonic(), entry[1])
+
+        with self._lock:
+            if entry is None:
+                self.misses += 1
+                self._frequencies.put(name, self._frequencies.get(name, 0) + 1)
+                return None
+            self.hits += 1
+            return entry[1]
+
+    def should_admit(self, name: str, size: int) -> bool:
+        """Whether a texture which was just missed is worth reading into memory."""
+        return 0 < size <= min(self.max_entry_bytes, self.max_bytes) \
+            and self._frequencies.get(name, 0) >= self.admit_after
+
+    def put(self, name: str, kind: str, data: bytes, last_modified) -> CachedTexture:
+        headers = cache_headers(name, last_modified)
+        texture = CachedTexture(
+            kind=kind,
+            body=data,
+            last_modified=last_modified,
+            headers=[("Content-Type", "image/png"), ("Content-Length", str(len(data)))] + headers,
+            not_modified_headers=headers,
+        )
+
+        with self._lock:
+            old = self._entries.pop(name, None)
+            if old is not None:
+                self.size -= len(old[1].body)
+            self._entries[name] = (monotonic(), texture)
+            self.size += len(data)
+            while self.size > self.max_bytes:
+                _, (_, evicted) = self._entries.popitem(last=False)
+                self.size -= len(evicted.body)
+            self._frequencies.pop(name)
+        return texture
+
+    def pop(self, name: str):
+        with self._lock:
+            entry = self._entries.pop(name, None)
+            if entry is not None:
+                self.size -= len(entry[1].body)
+
+    def served(self, texture: CachedTexture):
+        with self._lock:
+            self.bytes_saved += len(texture.body)
+
+    def stats(self) -> dict:
+        with self._lock:
+            requests = self.hits + self.misses
+            return {
+                "entries": len(self._entries),
+                "bytes": self.size,
+                "max_bytes": self.max_bytes,
+                "hits": self.hits,
+                "misses": self.misses,
+                "hit_rate": self.hits / requests if requests else 0.0,
+                "bytes_saved": self.bytes_saved,
+            }
+
+
+texture_memory_cache = TextureMemoryCache()
+
+
+def configure(max_bytes=16 * 1024 * 1024, max_entry_bytes=64 * 1024, admit_after=2):
+    """Replace the texture memory cache.
+
+    :param int max_bytes: Maximum total size of cached bodies, 0 to disable
+    :param int max_entry_bytes: Maximum size of a single cached body
+    :param int admit_after: Requests for a texture before it is cached
+    """
+    global texture_memory_cache
+    texture_memory_cache = TextureMemoryCache(max_bytes=max_bytes, max_entry_bytes=max_entry_bytes,
+                                              admit_after=admit_after)
+
+
+def get_cached_texture(name: str):
+    """:rtype: CachedTexture or None"""
+    return texture_memory_cache.get(name)
+
+
+def should_cache_texture(name: str, size: int) -> bool:
+    return texture_memory_cache.should_admit(name, size)
+
+
+def cache_texture(name: str, kind: str, data: bytes, last_modified) -> CachedTexture:
+    """Keep a texture and its response headers in memory.
+
+    :param name: Name of the texture
+    :param kind: "skin" or "cape"
+    :param data: PNG file contents
+    :param datetime last_modified: Modification time, second precision
+    """
+    return texture_memory_cache.put(name, kind, data, last_modified)
+
+
+def texture_served(texture: CachedTexture):
+    """Count a body served from memory."""
+    texture_memory_cache.served(texture)
+
+
+def texture_memory_cache_stats() -> dict:
+    return texture_memory_cache.stats()
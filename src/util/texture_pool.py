@@ -0,0 +1,54 @@
+from io import BytesIO
+
+from PIL import Image, UnidentifiedImageError
+
+from util.exceptions import InvalidImageException
+from util.process_pool import BoundedProcessPool
+from util.textures import normalize_texture, encode_texture, texture_hash
+
+texture_pool = BoundedProcessPool(max_queued=32)
+
+
+def configure(max_workers=None, max_queued=32, timeout=10.0):
+    """Replace the texture processing pool.
+
+    :param int or None max_workers: Amount of worker processes, defaults to the amount of CPUs
+    :param int max_queued: Maximum amount of uploads waiting for or being processed in a worker
+    :param float timeout: Seconds to wait for a free slot and again for the result
+    """
+    global texture_pool
+    texture_pool.shutdown()
+    texture_pool = BoundedProcessPool(max_workers=max_workers, max_queued=max_queued, timeout=timeout)
+    texture_pool.start()
+
+
+def _prepare(data: bytes, sizes):
+    try:
+        image = Image.open(BytesIO(data))
+        image.load()
+    except (UnidentifiedImageError, OSError, ValueError) as e:
+        raise InvalidImageException(f"Image could not be decoded: {e}")
+
+    if image.format != "PNG":
+        raise InvalidImageException(f"Image must be in PNG format. It is {image.format}")
+    if image.size not in sizes:
+        raise ValueError(f"Image size must be one of {sorted(sizes)}. It is {image.size}")
+
+    image = normalize_texture(image)
+    return texture_hash(image), encode_texture(image)
+
+
+def prepare_texture(data: bytes, sizes):
+    """Decode, normalize and encode an uploaded texture in the texture pool.
+
+    Keeps the CPU heavy part of an upload out of the request thread, and out of its database transaction.
+
+    :param data: Uploaded file contents
+    :param sizes: Set of allowed (width, height), see util.png_header
+    :raise InvalidImageException: If it is not a PNG or could not be decoded
+    :raise ValueError: If it has a size not in sizes
+    :raise PoolBusyException: If the pool is too busy to process it in time.
+    :return: (content address, PNG file contents) for Profile.update_skin() or Profile.update_cape()
+    :rtype: tuple
+    """
+    return texture_pool.run(_prepare, data, sizes)
@@ -0,0 +1,348 @@
+import mmap
+import os
+from collections import namedtuple
+from contextlib import contextmanager
+from stat import S_ISREG
+from struct import Struct
+from threading import Lock
+from time import time, monotonic
+
+from paths import SKINS_ROOT, CAPES_ROOT, TEXTURE_PACK_PATH, TEXTURE_PACK_INDEX_PATH, TEXTURE_PACK_LOCK_PATH, \
+    texture_path, texture_paths
+from util.textures import write_texture
+
+TextureEntry = namedtuple("TextureEntry", [
+    "kind",
+    "path",  # None if the texture is not a file of its own
+    "size",
+    "mtime",
+])
+
+KIND_ROOTS = {
+    "skin": SKINS_ROOT,
+    "cape": CAPES_ROOT,
+}
+
+
+class FileTextureStorage:
+    """Every texture is a file of its own, at paths.texture_path()."""
+
+    def stat(self, kind: str, name: str):
+        """:rtype: TextureEntry or None"""
+        for path in texture_paths(KIND_ROOTS[kind], name):
+            try:
+                stat_result = path.stat()
+            except (FileNotFoundError, NotADirectoryError, ValueError):
+                continue
+            if S_ISREG(stat_result.st_mode):
+                return TextureEntry(kind=kind, path=path, size=stat_result.st_size, mtime=stat_result.st_mtime)
+        return None
+
+    def read(self, kind: str, name: str):
+        """:rtype: bytes or None"""
+        entry = self.stat(kind, name)
+        if entry is None:
+            return None
+        try:
+            return entry.path.read_bytes()
+        except FileNotFoundError:
+            return None
+
+    def write(self, kind: str, name: str, data: bytes) -> bool:
+        """Store a texture unless one with the same name is stored already.
+
+        :return: Whether it was written
+        """
+        if self.stat(kind, name) is not None:
+            return False
+        write_texture(data, texture_path(KIND_ROOTS[kind], name))
+        return True
+
+    def delete(self, kind: str, name: str):
+        for path in texture_paths(KIND_ROOTS[kind], name):
+            try:
+                path.unlink()
+            except FileNotFoundError:
+                pass
+
+
+class PackTextureStorage:
+    """Textures are appended to a single pack file, located by an append-only index file.
+
+    Index records are (kind, operation, mtime, offset, length, name length) followed by the name.
+    Deleting appends a tombstone, the space is reclaimed by script/compacttextures.py, which replaces both files.
+    Reads slice a memory map of the pack. Other processes' writes are picked up by reading the index tail
+    on a miss or every refresh_interval seconds, compaction is noticed by the index file being replaced.
+    Writers, and readers while they catch up, hold a lock on a separate lock file.
+
+    Textures which were not moved into the pack are still found as files.
+    """
+
+    RECORD = Struct(">BBIQIB")
+    KINDS = ["skin", "cape"]
+    PUT, DELETE = 0, 1
+
+    def __init__(self, refresh_interval=5):
+        """
+        :param float refresh_interval: Seconds before changes by other processes are looked for on a hit
+        """
+        self.refresh_interval = refresh_interval
+        self.files = FileTextureStorage()
+
+        self._entries = {}  # (kind, name) -> (offset, length, mtime)
+        self._index_identity = None  # (st_dev, st_ino) of the index file _entries was read from
+        self._index_position = 0
+        self._map = None
+        self._map_identity = None  # (st_dev, st_ino, st_size) of the pack file _map maps
+        self._last_refresh = None
+        self._lock = Lock()
+
+    @classmethod
+    def encode_record(cls, kind, operation, mtime, offset, length, name) -> bytes:
+        name_bytes = name.encode("utf-8")
+        return cls.RECORD.pack(cls.KINDS.index(kind), operation, int(mtime), offset, length, len(name_bytes)) \
+            + name_bytes
+
+    @classmethod
+    def decode_records(cls, data: bytes):
+        """Parse index records, stopping at an incomplete one.
+
+        :return: ([(kind, operation, mtime, offset, length, name)], amount of bytes parsed)
+        """
+        records, position = [], 0
+        while position + cls.RECORD.size <= len(data):
+            kind, operation, mtime, offset, length, name_length = cls.RECORD.unpack_from(data, position)
+            end = position + cls.RECORD.size + name_length
+            if end > len(data):
+                break
+            name = data[position + cls.RECORD.size:end].decode("utf-8")
+            records.append((cls.KINDS[kind], operation, mtime, offset, length, name))
+            position = end
+        return records, position
+
+    @staticmethod
+    @contextmanager
+    def file_lock(exclusive: bool):
+        """Lock the pack against other processes."""
+        import fcntl  # Only the pack backend needs it, the file backend also works where it is missing.
+
+        with open(TEXTURE_PACK_LOCK_PATH, "a+b") as lock_file:
+            fcntl.flock(lock_file, fcntl.LOCK_EX if exclusive else fcntl.LOCK_SH)
+            try:
+                yield
+            finally:
+                fcntl.flock(lock_file, fcntl.LOCK_UN)
+
+    def _apply(self, records):
+        for kind, operation, mtime, offset, length, name in records:
+            if operation == self.PUT:
+                self._entries[(kind, name)] = (offset, length, mtime)
+            else:
+                self._entries.pop((kind, name), None)
+
+    def _refresh(self):
+        """Catch up with the index and pack files. Call holding self._lock and file_lock().
+
+        :return: Index file positioned after the last complete record, or None if there is no index
+        """
+        try:
+            index_file = open(TEXTURE_PACK_INDEX_PATH, "r+b")
+        except FileNotFoundError:
+            self._entries, self._index_identity, self._index_position = {}, None, 0
+            index_file = None
+        else:
+            index_stat = os.fstat(index_file.fileno())
+            if (index_stat.st_dev, index_stat.st_ino) != self._index_identity:  # Created or compacted.
+                self._entries, self._index_position = {}, 0
+                self._index_identity = (index_stat.st_dev, index_stat.st_ino)
+
+            index_file.seek(self._index_position)
+            records, parsed = self.decode_records(index_file.read())
+            self._apply(records)
+            self._index_position += parsed
+            index_file.seek(self._index_position)
+
+        self._remap()
+        self._last_refresh = monotonic()
+        return index_file
+
+    def _remap(self):
+        """Map the whole pack if it changed. Earlier maps stay alive as long as slices of them are in use."""
+        try:
+            with open(TEXTURE_PACK_PATH, "rb") as pack_file:
+                pack_stat = os.fstat(pack_file.fileno())
+                identity = (pack_stat.st_dev, pack_stat.st_ino, pack_stat.st_size)
+                if identity != self._map_identity:
+                    self._map = mmap.mmap(pack_file.fileno(), 0, access=mmap.ACCESS_READ) \
+                        if pack_stat.st_size > 0 else None
+                    self._map_identity = identity
+        except FileNotFoundError:
+            self._map, self._map_identity = None, None
+
+    def _find(self, kind: str, name: str):
+        """:return: (offset, length, mtime, memory map of the pack they refer to) or None"""
+        with self._lock:
+            location = self._entries.get((kind, name))
+            stale = self._last_refresh is None or monotonic() - self._last_refresh > self.refresh_interval
+            if location is None or stale:
+                with self.file_lock(exclusive=False):
+                    index_file = self._refresh()
+                if index_file is not None:
+                    index_file.close()
+                location = self._entries.get((kind, name))
+
+            if location is None or self._map is None or location[0] + location[1] > len(self._map):
+                return None
+            return location + (self._map,)
+
+    def stat(self, kind: str, name: str):
+        """:rtype: TextureEntry or None"""
+        found = self._find(kind, name)
+        if found is None:
+            return self.files.stat(kind, name)
+        return TextureEntry(kind=kind, path=None, size=found[1], mtime=found[2])
+
+    def read(self, kind: str, name: str):
+        """:return: Slice of the memory mapped pack, or contents of the file if the texture is not packed
+        :rtype: memoryview or bytes or None
+        """
+        found = self._find(kind, name)
+        if found is None:
+            return self.files.read(kind, name)
+        offset, length, _, pack_map = found
+        return memoryview(pack_map)[offset:offset + length]
+
+    def write(self, kind: str, name: str, data: bytes) -> bool:
+        """Store a texture unless one with the same name is stored already.
+
+        :return: Whether it was written
+        """
+        if self.files.stat(kind, name) is not None:
+            return False
+        return self._append(kind, name, data)
+
+    def pack(self, kind: str, name: str, data: bytes) -> bool:
+        """Append a texture even if it is stored as a file, see script/packtextures.py.
+
+        :return: Whether it was written, False if it was packed already
+        """
+        return self._append(kind, name, data)
+
+    def delete(self, kind: str, name: str):
+        self._append(kind, name, None)
+        self.files.delete(kind, name)
+
+    def compact(self, keep=None):
+        """Rewrite the pack and index without deleted textures.
+
+        Other processes keep reading their map of the old pack until they notice the new index.
+
+        :param keep: Set of (kind, name) to keep, or None to keep every texture which was not deleted
+        :return: (pack size before, pack size after)
+        """
+        temporary_pack_path = TEXTURE_PACK_PATH.with_name(f".{TEXTURE_PACK_PATH.name}.tmp")
+        temporary_index_path = TEXTURE_PACK_INDEX_PATH.with_name(f".{TEXTURE_PACK_INDEX_PATH.name}.tmp")
+
+        with self._lock, self.file_lock(exclusive=True):
+            index_file = self._refresh()
+            if index_file is None:
+                return 0, 0
+            index_file.close()
+
+            entries = sorted(self._entries.items(), key=lambda item: item[1][0])
+            size_before = 0 if self._map is None else len(self._map)
+
+            offset = 0
+            with open(temporary_pack_path, "wb") as pack_file, open(temporary_index_path, "wb") as index_file:
+                for (kind, name), (old_offset, length, mtime) in entries:
+                    if keep is not None and (kind, name) not in keep:
+                        continue
+                    pack_file.write(self._map[old_offset:old_offset + length])
+                    index_file.write(self.encode_record(kind, self.PUT, mtime, offset, length, name))
+                    offset += length
+
+            # Readers catch up under the shared lock, so they never see one file replaced without the other.
+            temporary_index_path.replace(TEXTURE_PACK_INDEX_PATH)
+            temporary_pack_path.replace(TEXTURE_PACK_PATH)
+
+            index_file = self._refresh()
+            if index_file is not None:
+                index_file.close()
+            return size_before, offset
+
+    def _append(self, kind, name, data) -> bool:
+        """Append a texture, or a tombstone if data is None."""
+        with self._lock, self.file_lock(exclusive=True):
+            index_file = self._refresh()
+            if index_file is None:
+                index_file = open(TEXTURE_PACK_INDEX_PATH, "w+b")
+                index_stat = os.fstat(index_file.fileno())
+                self._index_identity = (index_stat.st_dev, index_stat.st_ino)
+
+            with index_file:
+                index_file.truncate(self._index_position)  # Drop a record left incomplete by a crash.
+
+                if data is None:
+                    if (kind, name) not in self._entries:
+                        return False
+                    record = self.encode_record(kind, self.DELETE, 0, 0, 0, name)
+                else:
+                    if (kind, name) in self._entries:
+                        return False
+                    with open(TEXTURE_PACK_PATH, "ab") as pack_file:
+                        offset = pack_file.seek(0, os.SEEK_END)
+                        pack_file.write(data)
+                    record = self.encode_record(kind, self.PUT, time(), offset, len(data), name)
+
+                index_file.write(record)
+
+            self._apply(self.decode_records(record)[0])
+            self._index_position += len(record)
+            self._remap()
+            return True
+
+
+def detect_backend() -> str:
+    """The pack backend is used once a pack exists, see script/packtextures.py."""
+    return "pack" if TEXTURE_PACK_INDEX_PATH.exists() else "file"
+
+
+def _create(backend):
+    return PackTextureStorage() if backend == "pack" else FileTextureStorage()
+
+
+texture_storage = _create(detect_backend())
+
+
+def configure(backend=None):
+    """Replace the texture storage.
+
+    :param str backend: "file", "pack", or None to detect it
+    """
+    global texture_storage
+    texture_storage = _create(backend or detect_backend())
+
+
+def stat_texture(kind: str, name: str):
+    """:rtype: TextureEntry or None"""
+    return texture_storage.stat(kind, name)
+
+
+def read_texture(kind: str, name: str):
+    """:rtype: bytes or memoryview or None"""
+    return texture_storage.read(kind, name)
+
+
+def store_texture(kind: str, name: str, data: bytes) -> bool:
+    """Store an encoded texture unless one with the same name is stored already.
+
+    :param kind: "skin" or "cape"
+    :param name: Content address of the texture
+    :param data: PNG file contents
+    :return: Whether it was written
+    """
+    return texture_storage.write(kind, name, data)
+
+
+def delete_texture(kind: str, name: str):
+    texture_storage.delete(kind, name)
@@ -0,0 +1,77 @@
+import os
+from hashlib import sha256
+from io import BytesIO
+from tempfile import mkstemp
+
+from PIL import Image
+
+PNG_OPTIONS = {
+    "format": "PNG",
+    "optimize": True,  # zlib level 9, and Pillow tries harder to pick small encoder settings
+}
+
+
+def normalize_texture(image):
+    """Copy the pixels of a texture into a fresh RGBA image.
+
+    Nothing of the upload but its pixels survives: not its color mode, palette, gamma, color profile or text chunks.
+
+    :param PIL.Image.Image image: Uploaded texture
+    :rtype: PIL.Image.Image
+    """
+    rgba = image.convert("RGBA")
+    return Image.frombytes("RGBA", rgba.size, rgba.tobytes())
+
+
+def encode_texture(image) -> bytes:
+    """Encode a normalized texture the way it is served.
+
+    :param PIL.Image.Image image: normalize_texture() result
+    """
+    buffer = BytesIO()
+    image.save(buffer, **PNG_OPTIONS)
+    return buffer.getvalue()
+
+
+def texture_hash(image) -> str:
+    """Get the content address of a texture.
+
+    Hashes the size and RGBA pixel data, so the same texture gets the same name however its PNG was encoded.
+
+    :param PIL.Image.Image image: Texture image
+    :return: 64 character hex SHA-256
+    """
+    rgba = image.convert("RGBA")
+    width, height = rgba.size
+    digest = sha256()
+    digest.update(width.to_bytes(4, "big"))
+    digest.update(height.to_bytes(4, "big"))
+    digest.update(rgba.tobytes())
+    return digest.hexdigest()
+
+
+def write_texture(data: bytes, path):
+    """Replace a texture file with data.
+
+    The file is written to a temporary file of its own next to its final path and renamed in place,
+    so it never exists half written, even while other processes write the same texture.
+
+    :param data: Encoded texture
+    :param pathlib.Path path: Path of the texture, missing parent directories are created
+    """
+    path.parent.mkdir(parents=True, exist_ok=True)
+    descriptor, temporary_path = mkstemp(dir=path.parent, prefix=f".{path.name}.")
+    try:
+        with open(descriptor, "wb") as file:
+            file.write(data)
+            file.flush()
+            os.fsync(file.fileno())
+        os.chmod(temporary_path, 0o644)  # mkstemp() makes it readable by the owner only
+        os.replace(temporary_path, path)
+    except BaseException:
+        try:
+            os.unlink(temporary_path)
+        except FileNotFoundError:
+            pass
+        raise
+
@@ -0,0 +1,70 @@
+from base64 import b64encode
+from json import dumps
+from threading import Lock
+
+from util.cache import LRUCache
+
+
+class TexturesPropertyCache:
+    """Encoded "textures" property values by profile.
+
+    An entry is reused until its profile is invalidated or it gets older than granularity seconds,
+    so the timestamp embedded in the value is refreshed on that granularity instead of per request.
+    """
+
+    def __init__(self, max_size=8192, granularity=60):
+        """
+        :param int max_size: Maximum amount of cached profiles
+        :param float granularity: Seconds an encoded value is reused for
+        """
+        self._cache = LRUCache(max_size=max_size, ttl=granularity)
+        self._revisions = {}  # profile id -> times invalidated
+        self._lock = Lock()
+
+    def get_value(self, profile, textures_host: str, skin_and_cape=None) -> str:
+        """Get the base64 encoded textures property of a profile.
+
+        :param db.Profile profile: Profile to encode the textures of
+        :param textures_host: Host serving the textures
+        :param tuple skin_and_cape: Passed on to Profile.get_texture_data()
+        """
+        with self._lock:
+            revision = self._revisions.get(profile.id, 0)
+
+        entry = self._cache.get(profile.id)
+        if entry is not None and entry[0] == revision and entry[1] == textures_host:
+            return entry[2]
+
+        value = b64encode(dumps(profile.get_texture_data(textures_host, skin_and_cape)).encode("utf-8")).decode("utf-8")
+        self._cache.put(profile.id, (revision, textures_host, value))
+        return value
+
+    def invalidate(self, profile_id: int):
+        """Forget the encoded value of a profile, and any value being encoded from older data right now."""
+        with self._lock:
+            self._revisions[profile_id] = self._revisions.get(profile_id, 0) + 1
+        self._cache.pop(profile_id)
+
+    def stats(self) -> dict:
+        return self._cache.stats()
+
+
+textures_property_cache = TexturesPropertyCache()
+
+
+def configure(max_size=8192, granularity=60):
+    """Replace the textures property cache.
+
+    :param int max_size: Maximum amount of cached profiles
+    :param float granularity: Seconds an encoded value, and the timestamp in it, is reused for
+    """
+    global textures_property_cache
+    textures_property_cache = TexturesPropertyCache(max_size=max_size, granularity=granularity)
+
+
+def get_textures_value(profile, textures_host: str, skin_and_cape=None) -> str:
+    return textures_property_cache.get_value(profile, textures_host, skin_and_cape)
+
+
+def invalidate_textures(profile_id: int):
+    textures_property_cache.invalidate(profile_id)
@@ -0,0 +1,51 @@
+from base64 import b64encode
+from hashlib import sha256
+from threading import Lock
+
+from cryptography.hazmat.primitives import hashes
+from cryptography.hazmat.primitives.asymmetric import padding
+
+from util.cache import LRUCache
+from util.crypto.textureskey import create_and_write_textures_keys
+
+_textures_key = None
+_textures_key_lock = Lock()
+
+
+def _get_textures_key():
+    global _textures_key
+    with _textures_key_lock:
+        if _textures_key is None:
+            _textures_key = create_and_write_textures_keys(overwrite=False)
+        return _textures_key
+
+
+signature_cache = LRUCache(max_size=8192)
+
+
+def configure(max_size=8192):
+    """Replace the textures signature cache.
+
+    :param int max_size: Maximum amount of cached signatures
+    """
+    global signature_cache
+    signature_cache = LRUCache(max_size=max_size)
+
+
+def sign_property_value(value: str) -> str:
+    """Get the base64 encoded SHA1withRSA signature of a property value, from the cache if possible.
+
+    Signatures only depend on the value, so they are cached by its hash and never expire.
+
+    :param value: Property value as sent in the response
+    """
+    value_bytes = value.encode("utf-8")
+    key = sha256(value_bytes).digest()
+
+    signature = signature_cache.get(key)
+    if signature is not None:
+        return signature
+
+    signature = b64encode(_get_textures_key().sign(value_bytes, padding.PKCS1v15(), hashes.SHA1())).decode("utf-8")
+    signature_cache.put(key, signature)
+    return signature
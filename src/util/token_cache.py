@@ -0,0 +1,98 @@
+from collections import namedtuple
+
+from pony.orm import commit
+
+from db import AccessToken
+from util.cache import LRUCache
+from util.exceptions import InvalidAuthHeaderException
+
+TokenRecord = namedtuple("TokenRecord", [
+    "uuid",
+    "account_id",
+    "client_token_uuid",
+    "profile_id",
+    "authentication_valid",
+    "expiry_utc",
+])
+
+token_cache = LRUCache(max_size=4096, ttl=60)
+
+
+def configure(max_size=4096, ttl=60):
+    """Replace the AccessToken cache.
+
+    :param int max_size: Maximum amount of cached AccessTokens
+    :param float ttl: Seconds an AccessToken stays cached
+    """
+    global token_cache
+    token_cache = LRUCache(max_size=max_size, ttl=ttl)
+
+
+def lookup_token(token):
+    """Get a TokenRecord from token string, from the cache if possible.
+
+    :param UUID or str token: JWT encoded token or token UUID string, either dashed or not, or UUID object
+    :rtype: TokenRecord or None
+    """
+    uuid_object = AccessToken.uuid_from_token(token)
+    if uuid_object is None:
+        return None
+
+    record = token_cache.get(uuid_object)
+    if record is not None:
+        return record
+
+    access_token = AccessToken.get(uuid=uuid_object)
+    if access_token is None:
+        return None
+
+    record = TokenRecord(
+        uuid=access_token.uuid,
+        account_id=access_token.client_token.account.id,
+        client_token_uuid=access_token.client_token.uuid,
+        profile_id=access_token.profile.id if access_token.profile is not None else None,
+        authentication_valid=access_token.authentication_valid,
+        expiry_utc=access_token.expiry_utc,
+    )
+    token_cache.put(uuid_object, record)
+    return record
+
+
+def lookup_header(header):
+    """Get a TokenRecord from Authorization Header, from the cache if possible.
+
+    :param str header: HTTP Request Header 'Authorization': 'Bearer <token>'
+    :raise InvalidAuthHeaderException: If Header doesn't start with "Bearer " or is empty.
+    :rtype: TokenRecord or None
+    """
+    if header is None or not header.startswith("Bearer ") or header == "Bearer ":
+        raise InvalidAuthHeaderException()
+
+    return lookup_token(header[7:])
+
+
+def commit_and_evict_tokens(uuid_objects):
+    """Commit the current db_session, then forget cached AccessTokens.
+
+    Evicting before the commit would let a concurrent request read the old state and cache it again.
+
+    :param uuid_objects: UUIDs of the revoked or deleted AccessTokens
+    """
+    commit()
+    for uuid_object in uuid_objects:
+        token_cache.pop(uuid_object)
+
+
+def commit_and_evict_account(account_id: int):
+    """Commit the current db_session, then forget every cached AccessToken of an account.
+
+    See commit_and_evict_tokens() for the order.
+
+    :param account_id: DBID of the account
+    """
+    commit()
+    token_cache.pop_where(lambda record: record.account_id == account_id)
+
+
+def token_cache_stats() -> dict:
+    return token_cache.stats()